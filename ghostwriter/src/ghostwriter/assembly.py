@@ -0,0 +1,158 @@
+"""
+Streaming assembly of the book file.
+
+Every section of the book is appended to the output file as soon as its workflow step
+is final: the research and design, each chapter when it is approved, the conclusion and
+the late-phase reports. A chapter approved before an earlier one (parallel writing) is
+held back until the chapters before it are written. A sidecar JSON index records the
+byte offset and length of every section written so far, and a fixed-size status line at
+the top of the file says how far the book is. The file is a readable partial book
+during the run, and finishing it only rewrites the status line.
+"""
+
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+STATUS_WIDTH = 72
+HEADER = b"# COMPLETE BOOK\n"
+SECTION_KEY = re.compile(r'research|design|chapter_\d+|conclusion|revision_history|final_control|evaluation')
+# Sections after the chapters, in book order, with the text used when a step left none
+CLOSING_SECTIONS = (
+    ('conclusion', 'No conclusion available'),
+    ('revision_history', ''),
+    ('final_control', 'No final control report available'),
+    ('evaluation', 'No evaluation available')
+)
+
+
+def render_section(key: str, text: str) -> str:
+    """Markdown of one book section, identical whether the book is streamed or compiled in memory"""
+    chapter = re.fullmatch(r'chapter_(\d+)', key)
+    if chapter:
+        return f"\n### Chapter {chapter.group(1)}\n{text}\n"
+    return {
+        'research': f"\n## RESEARCH REPORT\n{text}\n",
+        'design': f"\n## BOOK DESIGN\n{text}\n\n## BOOK CONTENT\n",
+        'conclusion': f"\n### Conclusion\n{text}\n",
+        'revision_history': f"\n## REVISION HISTORY\n{text}",
+        'final_control': f"\n## FINAL QUALITY CONTROL REPORT\n{text}\n",
+        'evaluation': f"\n## DIRECTOR'S FINAL EVALUATION\n{text}\n"
+    }[key]
+
+
+def section_keys(chapter_count: int) -> list:
+    """Keys of the book sections in book order"""
+    return (['research', 'design'] + [f'chapter_{i}' for i in range(1, chapter_count + 1)]
+            + [key for key, _ in CLOSING_SECTIONS])
+
+
+def placeholder(key: str) -> str:
+    """Text of a section whose step produced nothing"""
+    chapter = re.fullmatch(r'chapter_(\d+)', key)
+    if chapter:
+        return f"Chapter {chapter.group(1)} not available"
+    return {'research': 'No research available', 'design': 'No design available', **dict(CLOSING_SECTIONS)}[key]
+
+
+def status_line(status: str) -> bytes:
+    """Fixed-size status comment, so it can be rewritten in place"""
+    return f"<!-- status: {status[:STATUS_WIDTH]:<{STATUS_WIDTH}} -->\n".encode('utf-8')
+
+
+class BookAssembler:
+    """Appends the sections of one book to its file in book order; thread-safe"""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + '.index.json')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.chapter_count = None  # Set once the design has fixed it
+        self.sections = []  # {'key', 'offset', 'length'} of the sections on disk
+        self._pending = {}  # Sections waiting for an earlier one; the texts are shared with the workflow results
+        self._next = 0
+        self._lock = threading.Lock()
+
+        header = HEADER + status_line("in progress")
+        with open(self.path, 'wb') as f:
+            f.write(header)
+        self._size = len(header)
+        self._write_index("in progress")
+
+    def set_chapter_count(self, chapter_count: int) -> None:
+        """Fix the number of chapters; sections after the design wait until it is known"""
+        with self._lock:
+            self.chapter_count = chapter_count
+            self._flush()
+
+    def add(self, key: str, text: str) -> None:
+        """Queue a final section and write every section that is next in book order"""
+        if not SECTION_KEY.fullmatch(key):
+            return
+        with self._lock:
+            if any(section['key'] == key for section in self.sections):
+                return
+            self._pending[key] = text
+            self._flush()
+
+    def finish(self) -> None:
+        """Write placeholders for the sections that never arrived and mark the book complete"""
+        with self._lock:
+            if self.chapter_count is None:
+                self.chapter_count = 0
+            for key in section_keys(self.chapter_count)[self._next:]:
+                self._pending.setdefault(key, placeholder(key))
+            self._flush()
+            self._write_status("complete")
+
+    def _flush(self) -> None:
+        order = section_keys(self.chapter_count or 0)
+        # Until the design has set the chapter count, nothing after the design is placed
+        limit = 2 if self.chapter_count is None else len(order)
+        written = []
+        while self._next < limit and order[self._next] in self._pending:
+            key = order[self._next]
+            block = render_section(key, self._pending.pop(key)).encode('utf-8')
+            written.append((key, block))
+            self._next += 1
+        if not written:
+            return
+
+        with open(self.path, 'ab') as f:
+            for key, block in written:
+                self.sections.append({'key': key, 'offset': self._size, 'length': len(block)})
+                f.write(block)
+                self._size += len(block)
+            f.flush()
+            os.fsync(f.fileno())
+
+        chapters = sum(1 for section in self.sections if section['key'].startswith('chapter_'))
+        self._write_status(f"in progress, {chapters} of {self.chapter_count} chapters" if self.chapter_count
+                           else "in progress")
+
+    def _write_status(self, status: str) -> None:
+        with open(self.path, 'r+b') as f:
+            f.seek(len(HEADER))
+            f.write(status_line(status))
+        self._write_index(status)
+
+    def _write_index(self, status: str) -> None:
+        temporary = self.index_path.with_name(self.index_path.name + '.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'status': status, 'chapters': self.chapter_count, 'sections': self.sections}, f, indent=1)
+        os.replace(temporary, self.index_path)
+
+
+def read_section(path: str, key: str) -> str:
+    """Read one section of a (possibly partial) book file through its index, or None if it is not written yet"""
+    index_path = Path(path).with_name(Path(path).name + '.index.json')
+    with open(index_path, encoding='utf-8') as f:
+        sections = json.load(f)['sections']
+    section = next((section for section in sections if section['key'] == key), None)
+    if section is None:
+        return None
+    with open(path, 'rb') as f:
+        f.seek(section['offset'])
+        return f.read(section['length']).decode('utf-8')
@@ -0,0 +1,150 @@
+"""
+Non-interactive batch mode: write every book of a job file against one LLM backend.
+
+Jobs run side by side on a thread pool. All crews share one LLM semaphore, one pool of
+Ollama endpoints and one web search tool, so the limits on calls in flight and on
+search rate hold for the whole batch rather than per book. A failing book is reported and the others carry on.
+"""
+
+import csv
+import json
+import statistics
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from .checkpoint import CheckpointStore
+from .profiling import Profiler
+from .routing import EndpointPool
+from .tools import CachedSearchTool
+
+BOOK_LENGTHS = ('short', 'medium', 'long')
+
+
+def parse_job(row: dict) -> dict:
+    """Validate one job and fill in the defaults; raises ValueError if it cannot be run"""
+    topic = (row.get('topic') or '').strip()
+    book_length = (row.get('book_length') or 'medium').strip().lower()
+    if not topic:
+        raise ValueError("topic is missing")
+    if book_length not in BOOK_LENGTHS:
+        raise ValueError(f"unknown book_length '{book_length}'")
+    return {
+        'topic': topic,
+        'target_audience': (row.get('target_audience') or '').strip() or 'General public',
+        'book_length': book_length
+    }
+
+
+def load_jobs(path: str) -> list:
+    """Read book jobs from a JSON lines or CSV file; raises ValueError listing every invalid job"""
+    path = Path(path)
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.suffix.lower() == '.csv':
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs, errors = [], []
+    for number, row in enumerate(rows, 1):
+        try:
+            jobs.append(parse_job(row))
+        except ValueError as e:
+            errors.append(f"job {number}: {e}")
+
+    if errors:
+        raise ValueError(f"Invalid jobs in {path}: " + '; '.join(errors))
+    return jobs
+
+
+def run_job(number: int, inputs: dict, args, shared: dict) -> dict:
+    """Write one book; every error is caught and reported in the returned result"""
+    from .main import book_basename, book_path, build_crew, export_profile
+
+    basename = f"{book_basename(inputs['topic'])}_{number:03d}"
+    checkpoint = CheckpointStore(Path(args.checkpoint_dir) / f"{basename}.jsonl")
+    result = {'job': number, **inputs, 'status': 'failed', 'seconds': 0.0, 'chapters': 0,
+              'output': None, 'checkpoint': str(checkpoint.path), 'error': None}
+
+    print(f"🚀 Job {number}: starting '{inputs['topic']}' ({inputs['book_length']})")
+    profiler = Profiler(enabled=args.profile)
+    started = time.perf_counter()
+    try:
+        crew = build_crew(args, profiler, **shared)
+        result['output'] = crew.run_complete_workflow(
+            inputs=inputs, checkpoint=checkpoint,
+            output_path=book_path(inputs['topic'], output_dir=args.output_dir, basename=basename)
+        )
+        result['chapters'] = crew.chapter_count
+        result['status'] = 'done'
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        traceback.print_exc()
+    result['seconds'] = time.perf_counter() - started
+    if profiler.enabled:
+        export_profile(profiler, Path(args.profile_dir) / basename)
+
+    if result['status'] == 'done':
+        print(f"✅ Job {number}: '{inputs['topic']}' saved as {result['output']} ({result['seconds'] / 60:.1f} min)")
+    else:
+        print(f"❌ Job {number}: '{inputs['topic']}' failed: {result['error']} (resume with: replay {checkpoint.path})")
+    return result
+
+
+def print_summary(results: list, wall_seconds: float) -> None:
+    """Print per-book latency and the throughput of the batch"""
+    print("\n" + "=" * 50)
+    print("📊 BATCH SUMMARY")
+    print("=" * 50)
+    print(f"{'job':>4} {'status':<7} {'length':<7} {'chapters':>8} {'minutes':>8}  topic")
+    for r in results:
+        print(f"{r['job']:>4} {r['status']:<7} {r['book_length']:<7} {r['chapters']:>8} "
+              f"{r['seconds'] / 60:>8.1f}  {r['topic']}")
+
+    done = [r for r in results if r['status'] == 'done']
+    print(f"\n📚 Books written: {len(done)}/{len(results)} in {wall_seconds / 60:.1f} min")
+    if done:
+        latencies = [r['seconds'] / 60 for r in done]
+        print(f"⏱️ Book latency: median {statistics.median(latencies):.1f} min, max {max(latencies):.1f} min")
+        print(f"🚀 Throughput: {len(done) / (wall_seconds / 3600):.2f} books/hour, "
+              f"{sum(r['chapters'] for r in done) / (wall_seconds / 3600):.1f} chapters/hour")
+
+
+def run_batch(args) -> int:
+    """Run every job of args.jobs; returns a non-zero exit code if any book failed"""
+    try:
+        jobs = load_jobs(args.jobs)
+    except (OSError, ValueError) as e:
+        print(f"❌ Cannot read jobs: {e}")
+        return 1
+    if not jobs:
+        print(f"❌ No jobs found in {args.jobs}")
+        return 1
+
+    print(f"📋 {len(jobs)} books, {args.max_books} at a time, at most {args.max_llm_calls} LLM calls in flight")
+    print("-" * 50)
+
+    # One LLM limit, one endpoint pool and one search rate limit for the whole batch
+    shared = {
+        'llm_slots': threading.BoundedSemaphore(args.max_llm_calls),
+        'endpoint_pool': EndpointPool(args.ollama_urls),
+        'search_tool': CachedSearchTool(cache_dir=args.cache_dir, ttl_hours=args.search_cache_ttl_hours)
+    }
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.max_books, thread_name_prefix="book") as pool:
+        results = list(pool.map(lambda job: run_job(job[0], job[1], args, shared), enumerate(jobs, 1)))
+    wall_seconds = time.perf_counter() - started
+
+    print_summary(results, wall_seconds)
+
+    summary_file = Path(args.output_dir) / f"batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    summary_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump({'wall_seconds': wall_seconds, 'jobs': results}, f, indent=2, ensure_ascii=False)
+    print(f"💾 Batch summary saved as: {summary_file}")
+
+    return 0 if all(r['status'] == 'done' for r in results) else 1
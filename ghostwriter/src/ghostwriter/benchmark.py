@@ -0,0 +1,361 @@
+"""
+Offline benchmark of the book creation workflow.
+
+A local stand-in for the Ollama API answers every model call with recorded or
+synthetic responses after a configurable latency, so the orchestration (phases,
+revision cycles, concurrency, context sizes, prompt prefill) can be measured without a GPU.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .profiling import Profiler
+
+WORDS = (
+    "honey bees colony hive queen worker drone pollen nectar flower season summer winter swarm comb wax "
+    "forager dance scent garden meadow orchard keeper frame brood cell larva royal jelly propolis guard "
+    "temperature humidity climate habitat decline research study evidence scientists farmers crops yield"
+).split()
+
+
+def synthetic_text(seed: str, words: int, heading: str = None) -> str:
+    """Deterministic prose of about the given length, in distinct paragraphs that end with a full stop"""
+    rng = random.Random(hashlib.sha256(seed.encode('utf-8')).hexdigest())
+    paragraphs = [f"# {heading}"] if heading else []
+    remaining = words
+    while remaining > 0:
+        size = min(remaining, rng.randint(60, 110))
+        sentences = []
+        while sum(len(s.split()) for s in sentences) < size:
+            sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 16)))
+            sentences.append(sentence.capitalize() + '.')
+        paragraphs.append(' '.join(sentences))
+        remaining -= size
+    return '\n\n'.join(paragraphs)
+
+
+class FakeOllamaServer:
+    """Minimal Ollama API (/api/tags, /api/show, /api/generate, /api/chat) serving canned responses.
+
+    Each response is delayed by latency seconds, plus the prefill of the prompt tokens
+    that are not cached at prefill_tokens_per_second, plus its length in tokens divided by
+    tokens_per_second. Like Ollama, the server keeps the last prompts of each model in
+    cache_slots slots and only prefills what follows the longest prefix shared with one of
+    them. Recordings are (substring, response) pairs checked before the synthetic responses.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 11434, latency: float = 0.01,
+                 tokens_per_second: float = 2000.0, recordings: list = None,
+                 prefill_tokens_per_second: float = 20000.0, cache_slots: int = 4) -> None:
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.cache_slots = cache_slots
+        self.recordings = recordings or []
+        self.requests = 0
+        self.requests_by_model = {}
+        self.prompt_chars = 0
+        self.cached_chars = 0
+        self._reviews = {}
+        self._slots = {}  # model -> prompts in its cache slots, most recently used last
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload: dict) -> None:
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send({'models': [{'name': name, 'model': name} for name in ('qwen3:14b', 'qwen3:4b')]})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if self.path == '/api/show':
+                    return self._send({'model_info': {}, 'template': '', 'parameters': ''})
+
+                prompt = request.get('prompt') or '\n'.join(
+                    str(message.get('content', '')) for message in request.get('messages', [])
+                )
+                answer = server.answer(prompt, request.get('model'))
+                prefill = server.prefill(prompt, request.get('model')) / 4 / server.prefill_tokens_per_second
+                generation = len(answer) / 4 / server.tokens_per_second
+                time.sleep(server.latency + prefill + generation)
+
+                text = f"Thought: I now can give a great answer\nFinal Answer: {answer}"
+                usage = {'prompt_eval_count': len(prompt) // 4, 'eval_count': len(text) // 4, 'done': True,
+                         'prompt_eval_duration': int(prefill * 1e9), 'eval_duration': int(generation * 1e9)}
+                if self.path == '/api/chat':
+                    self._send({'model': request.get('model'), 'message': {'role': 'assistant', 'content': text}, **usage})
+                else:
+                    self._send({'model': request.get('model'), 'response': text, **usage})
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def new_book(self) -> None:
+        """Forget the review history, per-model counts and cached prompts, so every book starts alike"""
+        with self._lock:
+            self._reviews.clear()
+            self.requests_by_model.clear()
+            self._slots.clear()
+
+    def prefill(self, prompt: str, model: str = None) -> int:
+        """Characters of the prompt that miss the prompt cache; the prompt then takes a cache slot.
+
+        A prompt that extends a cached one takes over its slot; any other prompt replaces the
+        least recently used slot, since Ollama copies the shared prefix there instead of
+        overwriting a longer cached prompt.
+        """
+        with self._lock:
+            slots = self._slots.setdefault(model, [])
+            best, cached = None, 0
+            for index, previous in enumerate(slots):
+                shared = len(os.path.commonprefix([previous, prompt]))
+                if shared > cached:
+                    best, cached = index, shared
+            if best is not None and cached == len(slots[best]):
+                slots.pop(best)
+            elif len(slots) >= self.cache_slots:
+                slots.pop(0)
+            slots.append(prompt)
+            self.cached_chars += cached
+        return len(prompt) - cached
+
+    def answer(self, prompt: str, model: str = None) -> str:
+        """Pick the response for a prompt"""
+        with self._lock:
+            self.requests += 1
+            self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+            self.prompt_chars += len(prompt)
+
+        for match, response in self.recordings:
+            if match in prompt:
+                return response
+
+        if 'structured outline in JSON' in prompt:
+            low, high = map(int, re.search(r'between (\d+) and (\d+) chapters', prompt).groups())
+            chapters = [
+                {'number': i, 'title': f"Part {i}", 'target_words': 600,
+                 'description': synthetic_text(f"outline {i}", 60)}
+                for i in range(1, (low + high) // 2 + 1)
+            ]
+            return json.dumps({'title': 'Benchmark Book', 'subtitle': '', 'chapters': chapters,
+                               'style_rules': ['Friendly tone', 'Short paragraphs']})
+
+        if 'Final check of Chapter' in prompt:
+            chapter = int(re.search(r'Final check of Chapter (\d+)', prompt).group(1))
+            return json.dumps({'chapter': chapter, 'findings': [],
+                               'terms': {'brood': 'eggs, larvae and pupae of the colony'},
+                               'names': ['Langstroth'], 'facts': [f"Chapter {chapter} puts a colony at 50,000 bees"]})
+
+        if 'Record the book state of the approved Chapter' in prompt:
+            chapter = int(re.search(r'approved Chapter (\d+)', prompt).group(1))
+            # Every chapter adds a few entries of its own, so the store grows with the book
+            word = WORDS[chapter % len(WORDS)]
+            return json.dumps({'chapter': chapter, 'entities': {'Langstroth': 'inventor of the movable-frame hive'},
+                               'terms': {'brood': 'eggs, larvae and pupae of the colony', word: f"as used in Chapter {chapter}"},
+                               'claims': [f"A strong {word} colony holds about {40 + chapter},000 bees"],
+                               'threads_opened': [f"How the {word} season ends"],
+                               'threads_closed': [f"How the {WORDS[(chapter - 1) % len(WORDS)]} season ends"]})
+
+        if 'could not be read as a review verdict' in prompt:
+            return json.dumps({'decision': 'APPROVED', 'summary': 'Ready.'})
+
+        if 'Review Chapter' in prompt or 'Re-review' in prompt:
+            # The first review of every chapter asks for minor revisions, the next one approves
+            chapter = re.search(r'(?:Review|revised) Chapter (\d+)', prompt).group(1)
+            with self._lock:
+                self._reviews[chapter] = self._reviews.get(chapter, 0) + 1
+                first_review = self._reviews[chapter] == 1
+            if first_review:
+                return json.dumps({'decision': 'MINOR_REVISIONS', 'summary': 'Good draft with a weak opening.',
+                                   'issues': [{'priority': 'MEDIUM', 'category': 'structure', 'location': 'P2',
+                                               'problem': 'The opening is slow', 'suggestion': 'Tighten it'}]})
+            return json.dumps({'decision': 'APPROVED', 'summary': 'Ready for publication.'})
+
+        if 'Return ONLY edit blocks' in prompt:
+            return f"<<<REPLACE P2>>>\n{synthetic_text(prompt[-200:], 80)}\n<<<END>>>"
+
+        seed = prompt[-500:]
+        if 'Research one facet' in prompt:
+            return synthetic_text(seed, 500) + "\n\nSOURCES: https://example.org/bees https://example.org/hives"
+        if 'Conduct comprehensive research' in prompt or 'Merge the facet research notes' in prompt:
+            return synthetic_text(seed, 2000, heading="Research Report")
+        if 'Write Chapter' in prompt:
+            return synthetic_text(seed, 500, heading="Chapter")
+        if 'digest' in prompt:
+            return synthetic_text(seed, 150)
+        return synthetic_text(seed, 400)
+
+
+def load_recordings(path: str) -> list:
+    """Read (match, response) pairs from a JSON lines file of {"match": ..., "response": ...} objects"""
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [(record['match'], record['response']) for record in records]
+
+
+def run_book(length: str, crew_options: dict, server: FakeOllamaServer) -> dict:
+    """Run the complete workflow for one book length and measure it"""
+    from .crew import PublishingHouseCrew
+
+    server.new_book()
+    requests_before = server.requests
+    prompt_chars_before, cached_chars_before = server.prompt_chars, server.cached_chars
+    profiler = Profiler()
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir, open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            crew = PublishingHouseCrew(cache_dir=cache_dir, use_cache=False, profiler=profiler, **crew_options)
+            book_file = crew.run_complete_workflow({
+                'topic': 'Honey bees', 'target_audience': 'General public', 'book_length': length
+            }, output_path=os.path.join(cache_dir, "book.md"))
+            book_bytes = os.path.getsize(book_file)
+        wall = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    phases = profiler.summary()
+    return {
+        'length': length,
+        'chapters': crew.chapter_count,
+        'wall_seconds': wall,
+        'llm_calls': sum(totals['llm_calls'] for totals in phases.values()),
+        'server_requests': server.requests - requests_before,
+        'requests_by_model': dict(server.requests_by_model),
+        'prompt_tokens': sum(totals['prompt_tokens'] for totals in phases.values()),
+        'prompt_tokens_by_phase': {phase: totals['prompt_tokens'] for phase, totals in phases.items()},
+        'prefill_seconds': sum(totals['prefill_seconds'] for totals in phases.values()),
+        'prompt_cache_share': (server.cached_chars - cached_chars_before) / max(server.prompt_chars - prompt_chars_before, 1),
+        'peak_memory_mb': peak / 1024 / 1024,
+        'book_bytes': book_bytes,
+        'metrics': dict(crew.metrics)
+    }
+
+
+def print_report(results: list) -> None:
+    """Print the benchmark results as tables"""
+    print(f"\n{'length':<8} {'chapters':>8} {'wall s':>8} {'LLM calls':>10} {'requests':>9} "
+          f"{'prompt tok':>11} {'prefill s':>10} {'cached':>7} {'peak MB':>8}")
+    for r in results:
+        print(f"{r['length']:<8} {r['chapters']:>8} {r['wall_seconds']:>8.2f} {r['llm_calls']:>10} "
+              f"{r['server_requests']:>9} {r['prompt_tokens']:>11} {r['prefill_seconds']:>10.2f} "
+              f"{r['prompt_cache_share']:>7.0%} {r['peak_memory_mb']:>8.1f}")
+
+    phases = list(dict.fromkeys(phase for r in results for phase in r['prompt_tokens_by_phase']))
+    print(f"\nPrompt tokens by phase (estimated)\n{'phase':<14}" + ''.join(f"{r['length']:>10}" for r in results))
+    for phase in phases:
+        print(f"{phase:<14}" + ''.join(f"{r['prompt_tokens_by_phase'].get(phase, 0):>10}" for r in results))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the book creation workflow against a fake Ollama server")
+    # `crewai test` calls the script with the number of iterations and a model name
+    parser.add_argument("n_iterations", nargs="?", type=int, default=1,
+                        help="number of runs of every book length (default: 1)")
+    parser.add_argument("model", nargs="?",
+                        help="ignored: the fake server answers for every model of agents.yaml")
+    parser.add_argument("--lengths", default="short,medium,long",
+                        help="comma-separated book lengths to run (default: short,medium,long)")
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="fixed delay of every model response in seconds (default: 0.01)")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0,
+                        help="simulated generation speed (default: 2000)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000.0,
+                        help="simulated prompt prefill speed for tokens missing the prompt cache (default: 20000)")
+    parser.add_argument("--writing-mode", choices=["sequential", "parallel", "pipelined"], default="sequential")
+    parser.add_argument("--research-mode", choices=["single", "fanout"], default="single")
+    parser.add_argument("--final-control", choices=["single", "mapreduce"], default="single")
+    parser.add_argument("--max-llm-calls", type=int, default=2,
+                        help="maximum LLM calls in flight at once (default: 2)")
+    parser.add_argument("--review-cascade", action="store_true",
+                        help="review with the controller's first-pass model and escalate when uncertain")
+    parser.add_argument("--recordings", help="JSON lines file of recorded responses to serve before synthetic ones")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    """Run the benchmark; returns a non-zero exit code if any book fails"""
+    args = parse_args(argv)
+    if args.model:
+        print(f"ℹ️ Ignoring model {args.model}: the benchmark runs the models of agents.yaml against the fake server")
+    # No telemetry and no interactive first-run prompts from crewai during the benchmark
+    for name, value in (('OTEL_SDK_DISABLED', 'true'), ('CREWAI_DISABLE_TELEMETRY', 'true'),
+                        ('CREWAI_TRACING_ENABLED', 'false'), ('CREWAI_TESTING', 'true')):
+        os.environ.setdefault(name, value)
+
+    crew_options = {
+        'writing_mode': args.writing_mode,
+        'research_mode': args.research_mode,
+        'final_control_mode': args.final_control,
+        'max_concurrent_llm_calls': args.max_llm_calls,
+        'review_cascade': args.review_cascade
+    }
+    recordings = load_recordings(args.recordings) if args.recordings else None
+
+    try:
+        server = FakeOllamaServer(latency=args.latency, tokens_per_second=args.tokens_per_second, recordings=recordings,
+                                  prefill_tokens_per_second=args.prefill_tokens_per_second)
+    except OSError as e:
+        print(f"❌ Cannot start the fake Ollama server on port 11434 ({e}). Stop the local Ollama server first.")
+        return 1
+
+    results = []
+    failed = False
+    with server:
+        for length in args.lengths.split(',') * max(args.n_iterations, 1):
+            print(f"⏱️ Benchmarking a {length} book ({args.writing_mode} writing, {args.research_mode} research)...")
+            try:
+                results.append(run_book(length, crew_options, server))
+            except Exception:
+                failed = True
+                print(f"❌ {length} book failed:")
+                traceback.print_exc()
+
+    if results:
+        print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
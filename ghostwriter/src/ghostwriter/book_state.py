@@ -0,0 +1,144 @@
+"""
+Incremental state of the book for consistency checks between chapters.
+
+After a chapter is approved, the summarizer records the entities and terms it
+introduces, the claims and figures it states and the threads it leaves open for later
+chapters. The store is bounded, and writers and reviewers only get the entries that
+concern their chapter. The context needed to stay consistent with the earlier chapters
+is therefore about the same for the last chapter as for the second.
+"""
+
+import threading
+
+from .retrieval import tokenize
+from .schemas import ChapterState
+
+
+def _key(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+
+def _name_words(name: str) -> set:
+    # Initials and short particles are left out, so "L. L. Langstroth" matches a text that says "Langstroth"
+    return {word for word in tokenize(name) if len(word) > 2}
+
+
+class BookState:
+    """Bounded store of the entities, terms, claims and open threads of the approved chapters; thread-safe.
+
+    The first description of an entity or term stays canonical. When a kind is full, the
+    entry that no chapter has mentioned for longest is dropped.
+    """
+
+    def __init__(self, max_entries: int = 60, max_threads: int = 20) -> None:
+        self.max_entries = max_entries
+        self.max_threads = max_threads
+        self.entities = {}  # key -> {'name', 'text', 'chapter', 'last'}
+        self.terms = {}
+        self.claims = []  # (claim, chapter), oldest first
+        self.threads = {}  # key -> (thread, chapter opened)
+        self.chapters = set()
+        self._lock = threading.Lock()
+
+    def update(self, state: ChapterState) -> None:
+        """Merge what an approved chapter introduced, closing the threads it resolves"""
+        chapter = state.chapter
+        with self._lock:
+            self.chapters.add(chapter)
+            for entries, found in ((self.entities, state.entities), (self.terms, state.terms)):
+                for name, text in found.items():
+                    key = _key(name)
+                    if not key:
+                        continue
+                    if key in entries:
+                        entry = entries[key]
+                        entry['last'] = max(entry['last'], chapter)
+                        entry['text'] = entry['text'] or text.strip()
+                    else:
+                        entries[key] = {'name': name.strip(), 'text': text.strip(), 'chapter': chapter, 'last': chapter}
+                while len(entries) > self.max_entries:
+                    del entries[min(entries, key=lambda k: (entries[k]['last'], entries[k]['chapter']))]
+
+            known = {_key(claim) for claim, _ in self.claims}
+            self.claims.extend((claim.strip(), chapter) for claim in state.claims
+                               if claim.strip() and _key(claim) not in known)
+            del self.claims[:max(len(self.claims) - self.max_entries, 0)]
+
+            for closed in state.threads_closed:
+                match = self._find_thread(closed)
+                if match:
+                    del self.threads[match]
+            for thread in state.threads_opened:
+                if thread.strip():
+                    self.threads.setdefault(_key(thread), (thread.strip(), chapter))
+            while len(self.threads) > self.max_threads:
+                del self.threads[next(iter(self.threads))]
+
+    def _find_thread(self, text: str):
+        """Key of the open thread a closing note refers to: the same text, or mostly the same words"""
+        key = _key(text)
+        if key in self.threads:
+            return key
+        words = set(tokenize(text))
+        best, best_overlap = None, 0.5
+        for candidate, (thread, _) in self.threads.items():
+            thread_words = set(tokenize(thread))
+            overlap = len(words & thread_words) / max(len(words | thread_words), 1)
+            if overlap >= best_overlap:
+                best, best_overlap = candidate, overlap
+        return best
+
+    def open_threads(self) -> list:
+        with self._lock:
+            return [thread for thread, _ in self.threads.values()]
+
+    def stats(self) -> str:
+        with self._lock:
+            return (f"{len(self.entities)} entities, {len(self.terms)} terms, "
+                    f"{len(self.claims)} claims, {len(self.threads)} open threads")
+
+    def relevant(self, query: str, max_per_kind: int = 12) -> str:
+        """Render the entries that concern a text, e.g. a chapter brief or draft, as one context block.
+
+        Entities and terms are relevant when all their words occur in the query, claims when
+        they mention one of those or share at least two content words with it. Open threads
+        are always included. An empty query selects the most recently mentioned entries.
+        """
+        query_words = {word.removesuffix("'s") for word in tokenize(query)}
+
+        def pick(entries: dict) -> list:
+            ranked = sorted(entries.values(), key=lambda entry: -entry['last'])
+            if query_words:
+                ranked = [entry for entry in ranked
+                          if _name_words(entry['name']) and _name_words(entry['name']) <= query_words]
+            # Book order, so the block reads the same for every call that selects the same entries
+            return sorted(ranked[:max_per_kind], key=lambda entry: (entry['chapter'], entry['name']))
+
+        with self._lock:
+            if not self.chapters:
+                return ''
+            entities, terms = pick(self.entities), pick(self.terms)
+            claims = self.claims[-max_per_kind:]
+            if query_words:
+                names = set().union(*(_name_words(entry['name']) for entry in entities + terms))
+                scored = [(len(set(tokenize(claim)) & query_words), index) for index, (claim, _) in enumerate(self.claims)]
+                claims = [self.claims[index] for score, index in scored
+                          if score >= 2 or set(tokenize(self.claims[index][0])) & names]
+                claims = claims[-max_per_kind:]
+            threads = list(self.threads.values())[-max_per_kind:]
+
+        parts = ["Established by the chapters approved so far; stay consistent with it "
+                 "unless the chapter deliberately corrects it."]
+        if entities:
+            parts.append("Entities:\n" + '\n'.join(
+                f"- {entry['name']} (ch. {entry['chapter']})" + (f": {entry['text']}" if entry['text'] else '')
+                for entry in entities))
+        if terms:
+            parts.append("Terms:\n" + '\n'.join(
+                f"- {entry['name']} (ch. {entry['chapter']})" + (f": {entry['text']}" if entry['text'] else '')
+                for entry in terms))
+        if claims:
+            parts.append("Claims and figures:\n" + '\n'.join(f"- (ch. {chapter}) {claim}" for claim, chapter in claims))
+        if threads:
+            parts.append("Open threads:\n" + '\n'.join(f"- (ch. {chapter}) {thread}" for thread, chapter in threads))
+        return '\n'.join(parts) if len(parts) > 1 else ''
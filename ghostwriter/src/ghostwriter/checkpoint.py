@@ -0,0 +1,51 @@
+"""
+Incremental on-disk checkpoints of a book creation workflow.
+
+Each completed step (a phase result, an approved chapter, a review) is appended to a
+JSON lines file as soon as it is available, so a crashed run can be resumed from the
+last completed step. Only final strings are stored, never crewai output objects.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+class CheckpointStore:
+    """Append-only log of workflow results; later records for the same key win"""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def save(self, key: str, value) -> None:
+        """Durably append one record to the log"""
+        line = json.dumps({'key': key, 'value': value}, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self) -> dict:
+        """Return the latest value of every key in the log"""
+        records = {}
+        if not self.path.exists():
+            return records
+
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written last line behind
+                    continue
+                records[record['key']] = record['value']
+        return records
+
+    @staticmethod
+    def latest(directory: str = "checkpoints"):
+        """Return the most recently modified checkpoint in directory, or None"""
+        candidates = sorted(Path(directory).glob("*.jsonl"), key=lambda p: p.stat().st_mtime)
+        return CheckpointStore(candidates[-1]) if candidates else None
@@ -0,0 +1,110 @@
+"""
+Helpers for keeping prompt context within a token budget.
+"""
+
+import litellm
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of a text (about four characters per token for English prose)"""
+    return (len(text) + 3) // 4
+
+
+def count_tokens(text: str, model: str = None) -> int:
+    """Token count of a text with the local tokenizer litellm picks for the model, or an estimate"""
+    if not text:
+        return 0
+    try:
+        return litellm.token_counter(model=model or "", text=text)
+    except Exception:
+        return estimate_tokens(text)
+
+
+def cut_to_tokens(text: str, max_tokens: int, count=estimate_tokens) -> str:
+    """Cut a text at a line break so it holds about max_tokens tokens, marking the cut"""
+    marker = "\n[... truncated to fit the context budget ...]\n"
+    tokens = count(text)
+    if tokens <= max_tokens:
+        return text
+    cut = text
+    while cut and count(cut + marker) > max_tokens:
+        # Token density varies along a text, so shrink until the count agrees
+        cut = cut[:len(cut) * max_tokens // (tokens + 1)].rsplit('\n', 1)[0]
+        tokens = count(cut + marker)
+    return cut + marker
+
+
+def fit_to_budget(sections: list, budget_tokens: int, count=estimate_tokens) -> tuple:
+    """Render (label, text) sections in priority order without exceeding budget_tokens.
+
+    Sections that fit are kept whole. The first one that does not fit is cut to the
+    remaining budget and every lower-priority section after it is dropped.
+
+    Returns the rendered text, its token count and the labels left out or cut.
+    """
+    parts = []
+    used = 0
+    omitted = []
+
+    for label, text in sections:
+        if not text:
+            continue
+
+        block = f"## {label}\n{text.strip()}\n"
+        cost = count(block)
+        remaining = budget_tokens - used
+
+        if cost <= remaining:
+            parts.append(block)
+            used += cost
+        elif remaining > 50:
+            parts.append(cut_to_tokens(block, remaining - 10, count))
+            used += count(parts[-1])
+            omitted.append(label)
+        else:
+            omitted.append(label)
+
+    return '\n'.join(parts), used, omitted
+
+
+class ContextOverflowError(RuntimeError):
+    """A prompt that does not fit the context window of its model"""
+
+
+class TokenBudget:
+    """Context window of one agent's prompts: the num_ctx of its model minus the tokens reserved for the answer"""
+
+    def __init__(self, model: str, num_ctx: int, reserve_tokens: int) -> None:
+        self.model = model
+        self.num_ctx = num_ctx
+        self.reserve_tokens = reserve_tokens
+
+    @property
+    def limit(self) -> int:
+        return max(self.num_ctx - self.reserve_tokens, 0)
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    def available(self, *fixed_texts: str) -> int:
+        """Tokens left for context once the fixed parts of a prompt are in"""
+        return max(self.limit - sum(self.count(text) for text in fixed_texts if text), 0)
+
+    def fit_blocks(self, blocks: list, budget_tokens: int) -> tuple:
+        """Trim (label, text) blocks to budget_tokens, cutting the first blocks first.
+
+        Blocks are given most widely shared first (research before the design brief of a
+        chapter), so the broadest context is trimmed first and the most specific is kept
+        longest. Returns the blocks in their original order and the labels cut or dropped.
+        """
+        fitted, trimmed = [], []
+        remaining = budget_tokens
+        for label, text in reversed(blocks):
+            cost = self.count(text)
+            if cost > remaining:
+                trimmed.append(label)
+                text = cut_to_tokens(text, remaining - 10, self.count) if remaining > 50 else ''
+                cost = self.count(text)
+            fitted.append((label, text))
+            remaining -= cost
+        return fitted[::-1], trimmed[::-1]
@@ -1,10 +1,33 @@
 import json
+import queue
 import re
-from crewai import Agent, Crew, Process, Task, LLM
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
-from crewai_tools import SerperDevTool
+from crewai.tasks.task_output import TaskOutput
 import litellm
 
+from .assembly import BookAssembler, placeholder, render_section, section_keys
+from .book_state import BookState
+from .cache import ResponseCache
+from .checkpoint import CheckpointStore
+from .context import ContextOverflowError, TokenBudget, cut_to_tokens, estimate_tokens, fit_to_budget
+from .drafts import PatchError, apply_edits, diff_drafts, number_paragraphs, parse_edits
+from .lint import lint_chapter, lint_report
+from .llm import CachedLLM
+from .models import DEFAULT_LLM_SETTINGS
+from .policy import RevisionRound, make_policy
+from .profiling import NULL_PROFILER, Profiler
+from .prompts import escape_placeholders, layout_description
+from .retrieval import ResearchIndex, extract_sources
+from .routing import EndpointPool
+from .tools import CachedSearchTool
+from .schemas import SHEET_MAX_ENTRIES, BookOutline, ChapterCheck, ChapterState, ReviewVerdict, extract_json
+
 @CrewBase
 class PublishingHouseCrew():
     """Crew to simulate a complete publishing house with enhanced writer-controller interaction"""
@@ -12,31 +35,166 @@ class PublishingHouseCrew():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
     
-    def __init__(self) -> None:
-        # Initialize tools
-        self.search_tool = SerperDevTool()
+    WRITING_MODES = ("sequential", "parallel", "pipelined")
+    RESEARCH_MODES = ("single", "fanout")
+    FINAL_CONTROL_MODES = ("single", "mapreduce")
+    
+    # Allowed number of chapters for each book length
+    CHAPTER_RANGES = {'short': (3, 5), 'medium': (4, 8), 'long': (8, 12)}
+    
+    # Output format shared by the full and incremental chapter reviews, parsed into a ReviewVerdict
+    REVIEW_VERDICT_FORMAT = """
+        Return ONLY a JSON object, without code fences or any text before or after it, with these fields:
+        - "decision": "APPROVED" (ready for publication), "MINOR_REVISIONS" (small changes needed),
+          "MAJOR_REVISIONS" (significant rewriting required) or "REJECT" (must be completely rewritten)
+        - "summary": two or three sentences on the main strengths and weaknesses
+        - "issues": a list with one object per problem, each with "priority" ("HIGH", "MEDIUM" or "LOW"),
+          "category" (grammar, content, consistency or structure), "location" (exact place in the chapter),
+          "problem" (what is wrong and why) and "suggestion" (the concrete correction)
+        - "resolved_issues": the issues of your previous review that are now fixed (re-reviews only)
         
-        # Configure local LLM with Ollama
-        self.llm = LLM(
-            model="ollama/qwen3:14b",
-            base_url="http://localhost:11434",
-            temperature=0.4,
-            seed=42
-        )
+        Any decision other than APPROVED must list at least one issue.
+    """
+    
+    # Settings of every agent LLM; llm_settings in agents.yaml override them per agent
+    DEFAULT_LLM_SETTINGS = DEFAULT_LLM_SETTINGS
+    
+    # Tokens kept free for the answer of an agent that sets no reserve_tokens in agents.yaml
+    DEFAULT_RESERVE_TOKENS = 4096
+    # Tokens crewai adds around every task: the agent's output format and answer instructions
+    PROMPT_OVERHEAD_TOKENS = 400
+    # Share of a chapter's ending that may change before the transition of the next chapter is rewritten
+    TRANSITION_STALE_RATIO = 0.25
+    # Smallest check sheet of a chapter the map-reduce final control can work with
+    MIN_SHEET_TOKENS = 40
+    # Ever more compact renderings of the check sheets: entries per list and finding priorities kept
+    SHEET_LEVELS = ((SHEET_MAX_ENTRIES, ('HIGH', 'MEDIUM', 'LOW')), (SHEET_MAX_ENTRIES, ('HIGH', 'MEDIUM')),
+                    (10, ('HIGH', 'MEDIUM')), (5, ('HIGH', 'MEDIUM')), (2, ('HIGH',)))
+    
+    def __init__(self, writing_mode: str = "sequential", research_mode: str = "single",
+                 final_control_mode: str = "single", max_workers: int = 4,
+                 max_concurrent_llm_calls: int = 2,
+                 use_cache: bool = True, cache_dir: str = ".ghostwriter_cache", cache_max_mb: int = 512,
+                 context_budget_tokens: int = 6000, incremental_review_max_change: float = 0.35,
+                 patch_revisions: bool = True, research_passages: int = 6, search_cache_ttl_hours: float = 168,
+                 profiler: Profiler = None, llm_slots: threading.BoundedSemaphore = None,
+                 search_tool: CachedSearchTool = None, progress=None, ollama_urls: list = None,
+                 endpoint_pool: EndpointPool = None, review_cascade: bool = False,
+                 revision_policy: str = "convergence", book_state: bool = True) -> None:
+        if writing_mode not in self.WRITING_MODES:
+            raise ValueError(f"Unknown writing mode '{writing_mode}'. Choose one of: {', '.join(self.WRITING_MODES)}")
+        if research_mode not in self.RESEARCH_MODES:
+            raise ValueError(f"Unknown research mode '{research_mode}'. Choose one of: {', '.join(self.RESEARCH_MODES)}")
+        if final_control_mode not in self.FINAL_CONTROL_MODES:
+            raise ValueError(f"Unknown final control mode '{final_control_mode}'. "
+                             f"Choose one of: {', '.join(self.FINAL_CONTROL_MODES)}")
         
-        # Store workflow state
+        # Initialize tools (search results are cached on disk independently of --no-cache).
+        # Crews running side by side pass one shared tool so its rate limit holds across books.
+        self.search_tool = search_tool or CachedSearchTool(cache_dir=cache_dir, ttl_hours=search_cache_ttl_hours)
+        
+        # Persistent cache of LLM responses, shared by every agent that does not opt out
+        self.response_cache = ResponseCache(
+            Path(cache_dir) / "llm_responses.sqlite3",
+            max_bytes=cache_max_mb * 1024 * 1024
+        ) if use_cache else None
+        
+        # Ollama endpoints; calls go to the least loaded healthy one. Crews running side by side share one pool.
+        self.endpoint_pool = endpoint_pool or EndpointPool(ollama_urls)
+        self.endpoint_pool.start_health_checks()
+        
+        # Spans of phases, chapters, tasks and LLM calls; records nothing unless profiling is enabled
+        self.profiler = profiler or NULL_PROFILER
+        # LLMs are built from the llm_settings of each agent in agents.yaml and shared by agents with equal settings
+        self._llms = {}
+        self._llm_lock = threading.Lock()
+        # Chapter reviews go to the controller's first-pass model and escalate to its main model when uncertain
+        self.review_cascade = review_cascade
+        
+        # Store workflow state (final strings only, mirrored to the checkpoint when one is attached)
         self.workflow_results = {}
+        self.checkpoint = None
+        self.assembler = None  # Streams the book to its output file when the workflow is given one
         self.chapter_count = 0
-        self.max_revision_cycles = 3  # Maximum revision cycles per chapter
+        self.outline = None  # BookOutline parsed from the design, None if the design could not be structured
+        self.max_revision_cycles = 3  # Maximum revision cycles per chapter, set by the revision policy of the book
+        # When to stop revising a chapter; the policy is tuned to the book length when the workflow starts
+        self.revision_policy_name = revision_policy
+        self.revision_policy = make_policy(revision_policy)
+        self._revision_history = {}  # chapter_num -> [RevisionRound]
+        self.context_budget_tokens = context_budget_tokens  # Context size for conclusion, final control and evaluation
+        self.context_sizes = {}
+        # Prompt tokens of every task against the context window of its agent, counted before kickoff
+        self.budget_usage = []
+        # Re-reviews only look at what changed unless more than this share of the chapter was rewritten
+        self.incremental_review_max_change = incremental_review_max_change
+        # Minor revisions are applied as paragraph edits instead of full rewrites
+        self.patch_revisions = patch_revisions
+        # Chapter tasks get the research passages most relevant to their outline entry, not the whole report
+        self.research_passages = research_passages
+        self.research_index = None
+        self._retrieved_passages = {}
+        self._index_lock = threading.Lock()
+        # Entities, terms, claims and open threads of the approved chapters, for consistency between chapters
+        self.track_book_state = book_state
+        self.book_state = BookState()
+        
+        # Concurrency settings: chapters in flight and LLM calls in flight are capped separately
+        self.writing_mode = writing_mode
+        self.research_mode = research_mode
+        self.final_control_mode = final_control_mode
+        self.max_workers = max_workers
+        # Crews writing several books at once share one semaphore, so the limit applies to the backend as a whole
+        self.llm_slots = llm_slots or threading.BoundedSemaphore(max_concurrent_llm_calls)
+        
+        # Timing statistics and counters
+        self.phase_timings = {}
+        self.metrics = {}
+        self._busy_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        
+        # Called with a dict for every phase started or finished and every step saved
+        self.progress = progress
         
     # ==================== AGENTS ====================
     
+    def _llm_for(self, agent_name: str, settings_key: str = 'llm_settings') -> CachedLLM:
+        """Return the LLM for an agent, built from its llm_settings in agents.yaml on top of DEFAULT_LLM_SETTINGS.
+        
+        Agents with `cache: false` bypass the response cache. LLMs are reused by agents with the same settings.
+        """
+        agent_config = self.agents_config[agent_name]
+        settings = {**self.DEFAULT_LLM_SETTINGS, **(agent_config.get(settings_key) or {})}
+        use_cache = agent_config.get('cache', True) and self.response_cache is not None
+        key = (json.dumps(settings, sort_keys=True), use_cache)
+        
+        with self._llm_lock:
+            if key not in self._llms:
+                self._llms[key] = CachedLLM(
+                    **settings,
+                    base_url=self.endpoint_pool.urls[0],
+                    response_cache=self.response_cache if use_cache else None,
+                    profiler=self.profiler,
+                    endpoint_pool=self.endpoint_pool
+                )
+            return self._llms[key]
+    
+    def _first_pass_controller(self) -> Agent:
+        """A controller running on the first_pass_llm_settings of agents.yaml, for cascaded reviews"""
+        if not self.agents_config['controller'].get('first_pass_llm_settings'):
+            raise ValueError("The review cascade needs first_pass_llm_settings for the controller in agents.yaml")
+        return Agent(
+            config=self.agents_config['controller'],
+            llm=self._llm_for('controller', 'first_pass_llm_settings'),
+            verbose=True
+        )
+    
     @agent
     def researcher(self) -> Agent:
         return Agent(
             config=self.agents_config['researcher'],
             tools=[self.search_tool],
-            llm=self.llm,
+            llm=self._llm_for('researcher'),
             verbose=True
         )
     
@@ -44,7 +202,7 @@ class PublishingHouseCrew():
     def designer(self) -> Agent:
         return Agent(
             config=self.agents_config['designer'],
-            llm=self.llm,
+            llm=self._llm_for('designer'),
             verbose=True
         )
     
@@ -52,7 +210,7 @@ class PublishingHouseCrew():
     def writer(self) -> Agent:
         return Agent(
             config=self.agents_config['writer'],
-            llm=self.llm,
+            llm=self._llm_for('writer'),
             verbose=True
         )
     
@@ -60,7 +218,15 @@ class PublishingHouseCrew():
     def controller(self) -> Agent:
         return Agent(
             config=self.agents_config['controller'],
-            llm=self.llm,
+            llm=self._llm_for('controller'),
+            verbose=True
+        )
+    
+    @agent
+    def summarizer(self) -> Agent:
+        return Agent(
+            config=self.agents_config['summarizer'],
+            llm=self._llm_for('summarizer'),
             verbose=True
         )
     
@@ -68,7 +234,7 @@ class PublishingHouseCrew():
     def director(self) -> Agent:
         return Agent(
             config=self.agents_config['director'],
-            llm=self.llm,
+            llm=self._llm_for('director'),
             verbose=True
         )
     
@@ -112,19 +278,103 @@ class PublishingHouseCrew():
     
     # ==================== DYNAMIC TASK CREATION ====================
     
-    def create_chapter_task(self, chapter_num: int, total_chapters: int, context_tasks: list = None, revision_notes: str = None) -> Task:
-        """Create a chapter writing task, optionally with revision notes"""
+    def create_research_facet_task(self, agent: Agent = None) -> Task:
+        """Create a research task for one facet of the topic; the facet is passed as the {facet} input"""
+        return Task(
+            config=self.tasks_config['research_facet_task'],
+            agent=agent or self.researcher()
+        )
+    
+    def create_research_merge_task(self, facet_reports: list, sources: list) -> Task:
+        """Create a task merging the facet research notes into the research report"""
+        research_spec = self.tasks_config['research_task']
+        notes = '\n\n'.join(f"=== FACET: {escape_placeholders(facet)} ===\n{escape_placeholders(report)}"
+                            for facet, report in facet_reports)
+        source_list = '\n        '.join(f"- {escape_placeholders(url)}" for url in sources) or "(no URLs were cited)"
+        
+        description = f"""
+        Merge the facet research notes below into one research report on the topic
+        "{{topic}}" for a book targeted at "{{target_audience}}".
+        
+        {notes}
+        
+        DEDUPLICATED SOURCES:
+        {source_list}
+        
+        Combine the notes into a single, well-organized report without repeating information
+        that several notes share. Keep every fact, figure and quote together with its source,
+        and cite each source once in the bibliography.
+        """
+        
+        return Task(
+            description=description,
+            expected_output=research_spec['expected_output'],
+            agent=self.researcher(),
+            context=[]
+        )
+    
+    def create_outline_task(self, design: str, book_length: str, previous_error: str = None) -> Task:
+        """Create a task turning the design document into a JSON outline, optionally repairing a rejected one"""
+        min_chapters, max_chapters = self.CHAPTER_RANGES.get(book_length, self.CHAPTER_RANGES['medium'])
+        
+        description = f"""
+        Convert the book design below into a structured outline in JSON.
+        
+        BOOK DESIGN:
+        {escape_placeholders(design)}
+        
+        Return a single JSON object with exactly these fields:
+        - "title": the book title
+        - "subtitle": the subtitle, or an empty string
+        - "chapters": the list of chapters in reading order, each an object with
+          "number" (1, 2, 3, ...), "title", "description" (what the chapter must cover,
+          2-3 paragraphs taken from the design) and "target_words" (planned length in words)
+        - "style_rules": a list of short rules on tone, style and special elements that apply to every chapter
+        
+        The book must have between {min_chapters} and {max_chapters} chapters. Do not count the
+        introduction, conclusion or appendices as chapters unless the design numbers them.
+        """
+        
+        if previous_error:
+            description += f"""
+        
+        Your previous outline was rejected: {escape_placeholders(previous_error)}
+        Fix this problem and return the complete corrected JSON object.
+        """
+        
+        expected_output = """
+        Only the JSON object, without code fences or any text before or after it.
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=self.designer(),
+            context=[]
+        )
+    
+    def create_chapter_task(self, chapter_num: int, total_chapters: int, context_blocks: list = None, revision_notes: str = None,
+                            previous_chapter_ending: str = None, target_words: int = None, agent: Agent = None) -> Task:
+        """Create a chapter writing task, optionally with revision notes.
+        
+        The context blocks come first and the chapter-specific text last, so drafts and
+        rewrites of a chapter share their prompt prefix (see prompts.py).
+        """
+        
+        length_requirement = (f"Write approximately {target_words} words" if target_words
+                              else "Write approximately 1500-3000 words for medium length books")
         
         base_description = f"""
         Write Chapter {chapter_num} of the book following the structure defined by the designer.
         
-        Use the research findings and design specifications from the previous tasks to inform your writing.
+        Use the research findings and design specifications above to inform your writing.
         
         Requirements:
         - Follow exactly the specifications for Chapter {chapter_num} from the design
         - Maintain consistency with the established tone and style
+        - Keep names, terms and figures consistent with the book state above, if one is given
         - Use relevant information from the research
-        - Write approximately 1500-3000 words for medium length books
+        - {length_requirement}
         - Create engaging content that flows naturally
         - End with a smooth transition (unless it's the final chapter)
         
@@ -136,13 +386,22 @@ class PublishingHouseCrew():
             description = base_description + f"""
             
         REVISION NOTES FROM CONTROLLER:
-        {revision_notes}
+        {escape_placeholders(revision_notes)}
         
         Please address all the issues mentioned in the revision notes while maintaining the overall quality and structure of the chapter.
         """
         else:
             description = base_description + "\n\nMake sure to reference and build upon the research findings and follow the structural design provided."
         
+        if previous_chapter_ending:
+            description += f"""
+        
+        ENDING OF CHAPTER {chapter_num - 1}:
+        {escape_placeholders(previous_chapter_ending)}
+        
+        Open this chapter with a transition that follows on naturally from the ending above.
+        """
+        
         expected_output = f"""
         A complete Chapter {chapter_num} that:
         - Follows the designer's specifications exactly
@@ -155,21 +414,70 @@ class PublishingHouseCrew():
         {"- Addresses all revision notes provided" if revision_notes else ""}
         """
         
+        agent = agent or self.writer()
         return Task(
-            description=description,
+            description=layout_description(self._fit_context_blocks(agent, context_blocks, description, expected_output),
+                                           description),
             expected_output=expected_output,
-            agent=self.writer(),
-            context=context_tasks or []
+            agent=agent,
+            context=[]
         )
     
-    def create_chapter_review_task(self, chapter_num: int, chapter_content: str) -> Task:
-        """Create a task for the controller to review a specific chapter"""
+    def create_chapter_patch_task(self, chapter_num: int, chapter_content: str, revision_notes: str,
+                                  context_blocks: list = None, agent: Agent = None) -> Task:
+        """Create a task asking the writer for targeted edits instead of a rewritten chapter"""
         
         description = f"""
-        Review Chapter {chapter_num} for quality, consistency, and correctness.
+        Revise Chapter {chapter_num} by editing only the paragraphs that need to change.
+        The controller asked for minor revisions; the rest of the chapter is already approved
+        and must stay exactly as it is.
         
-        CHAPTER CONTENT TO REVIEW:
-        {chapter_content}
+        CURRENT CHAPTER (every paragraph is labelled with its anchor):
+        {escape_placeholders(number_paragraphs(chapter_content))}
+        
+        REVISION NOTES FROM CONTROLLER:
+        {escape_placeholders(revision_notes)}
+        
+        Return ONLY edit blocks, one per change, using the anchors above:
+        
+        <<<REPLACE P3>>>
+        The full new text of paragraph 3.
+        <<<END>>>
+        
+        <<<INSERT_AFTER P5>>>
+        A new paragraph to add after paragraph 5.
+        <<<END>>>
+        
+        <<<DELETE P7>>>
+        <<<END>>>
+        
+        Anchors always refer to the numbering shown above. Edit each paragraph at most once,
+        do not include the anchor labels in the new text, and do not repeat unchanged paragraphs.
+        """
+        
+        expected_output = f"""
+        A list of edit blocks for Chapter {chapter_num} that together address every revision note.
+        """
+        
+        agent = agent or self.writer()
+        return Task(
+            description=layout_description(self._fit_context_blocks(agent, context_blocks, description, expected_output),
+                                           description),
+            expected_output=expected_output,
+            agent=agent,
+            context=[]
+        )
+    
+    def create_chapter_review_task(self, chapter_num: int, chapter_content: str, context_blocks: list = None,
+                                   lint_findings: str = None, agent: Agent = None) -> Task:
+        """Create a task for the controller to review a specific chapter.
+        
+        The review instructions come before the draft, so only the draft and the lint
+        findings differ between the reviews of a chapter.
+        """
+        
+        description = f"""
+        Review Chapter {chapter_num} for quality, consistency, and correctness.
         
         Perform a detailed analysis focusing on:
         
@@ -187,7 +495,8 @@ class PublishingHouseCrew():
         
         3. CONSISTENCY:
            - Adherence to established tone and style
-           - Consistency with previous chapters (if applicable)
+           - Consistency with previous chapters: names, terms, claims and figures must agree
+             with the book state above, if one is given
            - Proper transitions and connections
         
         4. STRUCTURE:
@@ -202,71 +511,319 @@ class PublishingHouseCrew():
         - Priority level (HIGH/MEDIUM/LOW)
         
         Chapter number: {chapter_num}
+        
+        CHAPTER CONTENT TO REVIEW:
+        {escape_placeholders(chapter_content)}
         """
         
-        expected_output = f"""
-        A detailed review report for Chapter {chapter_num} that includes:
-        
-        1. OVERALL ASSESSMENT:
-           - Quality rating (EXCELLENT/GOOD/NEEDS_IMPROVEMENT/POOR)
-           - Summary of main strengths
-           - Summary of main issues
-        
-        2. SPECIFIC ISSUES FOUND:
-           - List each problem with exact location
-           - Categorize by type (grammar, content, consistency, structure)
-           - Provide specific correction suggestions
-           - Assign priority level
-        
-        3. RECOMMENDATIONS:
-           - Required changes (HIGH priority)
-           - Suggested improvements (MEDIUM/LOW priority)
-           - Overall guidance for revision
-        
-        4. DECISION:
-           - APPROVED: Chapter is ready for publication
-           - MINOR_REVISIONS: Small changes needed
-           - MAJOR_REVISIONS: Significant rewriting required
-           - REJECT: Chapter needs to be completely rewritten
+        if lint_findings:
+            description += f"""
+        AUTOMATIC CHECKS (already run on the whole chapter, do not report these findings again):
+        {lint_findings}
+        """
         
+        expected_output = f"""
+        A review verdict for Chapter {chapter_num}.
+        {self.REVIEW_VERDICT_FORMAT}
         Be constructive and specific in your feedback to help the writer improve the chapter effectively.
         """
         
+        agent = agent or self.controller()
+        return Task(
+            description=layout_description(self._fit_context_blocks(agent, context_blocks, description, expected_output),
+                                           description),
+            expected_output=expected_output,
+            agent=agent,
+            context=[]
+        )
+    
+    def create_chapter_incremental_review_task(self, chapter_num: int, previous_review: str, diff: dict,
+                                               lint_findings: str = None, agent: Agent = None) -> Task:
+        """Create a task for the controller to re-review only the passages changed by a revision"""
+        
+        description = f"""
+        Re-review the revised Chapter {chapter_num}. You already reviewed the previous draft;
+        the writer has since revised it. Only the passages listed below have changed, every
+        other paragraph is identical to the draft you reviewed.
+        
+        YOUR PREVIOUS REVIEW:
+        {escape_placeholders(previous_review)}
+        
+        CHANGES SINCE THE PREVIOUS DRAFT (paragraph numbers refer to the revised chapter):
+        {escape_placeholders(diff['summary'])}
+        
+        REVISED PASSAGES:
+        {escape_placeholders(diff['changed_passages'])}
+        
+        Check that:
+        1. Every issue raised in your previous review has been addressed
+        2. The revised passages are grammatically correct and consistent in tone and style
+        3. The revised passages connect smoothly with the unchanged text around them
+        4. The revision did not introduce new problems
+        
+        Chapter number: {chapter_num}
+        """
+        
+        if lint_findings:
+            description += f"""
+        AUTOMATIC CHECKS (already run on the whole chapter, do not report these findings again):
+        {lint_findings}
+        """
+        
+        expected_output = f"""
+        A review verdict for the revised Chapter {chapter_num}, listing only the issues that remain or are new.
+        {self.REVIEW_VERDICT_FORMAT}
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=agent or self.controller(),
+            context=[]
+        )
+    
+    def create_review_repair_task(self, chapter_num: int, review_response: str, error: str, agent: Agent = None) -> Task:
+        """Create a task asking the controller to restate a review that could not be parsed as a verdict"""
+        
+        description = f"""
+        Your review of Chapter {chapter_num} could not be read as a review verdict.
+        
+        PROBLEM:
+        {escape_placeholders(error)}
+        
+        YOUR REVIEW:
+        {escape_placeholders(review_response)}
+        
+        Restate this review in the required format. Keep the same decision and the same issues;
+        do not review the chapter again.
+        """
+        
+        expected_output = f"""
+        The review verdict for Chapter {chapter_num}.
+        {self.REVIEW_VERDICT_FORMAT}
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=agent or self.controller(),
+            context=[]
+        )
+    
+    def create_chapter_digest_task(self, chapter_num: int, chapter_content: str, agent: Agent = None) -> Task:
+        """Create a task condensing an approved chapter into a short digest"""
+        
+        description = f"""
+        Write a compact digest of the approved Chapter {chapter_num}.
+        
+        CHAPTER CONTENT:
+        {escape_placeholders(chapter_content)}
+        
+        The digest must capture:
+        - The chapter title and its main purpose
+        - The key ideas, arguments and findings, in the order they appear
+        - Important examples, case studies, quotes and figures
+        - How the chapter opens and how it hands over to the next one
+        """
+        
+        expected_output = f"""
+        A digest of Chapter {chapter_num} of at most 200 words, written as plain
+        prose without headings, faithful to the chapter and free of commentary.
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=agent or self.summarizer(),
+            context=[]
+        )
+    
+    def create_chapter_state_task(self, chapter_num: int, chapter_content: str, open_threads: list,
+                                  agent: Agent = None) -> Task:
+        """Create a task recording what an approved chapter adds to the book state"""
+        
+        threads = '\n'.join(f"- {thread}" for thread in open_threads) or "(none)"
+        description = f"""
+        Record the book state of the approved Chapter {chapter_num}: what later chapters must
+        stay consistent with. List only what this chapter itself introduces or states.
+        
+        OPEN THREADS OF THE EARLIER CHAPTERS:
+        {escape_placeholders(threads)}
+        
+        CHAPTER CONTENT:
+        {escape_placeholders(chapter_content)}
+        """
+        
+        expected_output = f"""
+        Return ONLY a JSON object, without code fences or any text before or after it, with these fields:
+        - "chapter": {chapter_num}
+        - "entities": an object mapping the people, organisations, places and works the chapter
+          introduces to who or what they are, in a few words, at most 15
+        - "terms": an object mapping the technical terms the chapter defines to their definition
+          as given in the chapter, at most 15
+        - "claims": the key claims, figures and dates the chapter states, each as one short
+          sentence with the figure exactly as written, at most 15
+        - "threads_opened": questions the chapter raises or topics it promises to cover later, at most 5
+        - "threads_closed": the open threads listed above that this chapter resolves, copied exactly
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=agent or self.summarizer(),
+            context=[]
+        )
+    
+    def create_book_summary_task(self, chapter_num: int, book_summary: str, digest: str) -> Task:
+        """Create a task folding a chapter digest into the rolling summary of the book"""
+        
+        description = f"""
+        Update the running summary of the book with the digest of Chapter {chapter_num}.
+        
+        CURRENT BOOK SUMMARY:
+        {escape_placeholders(book_summary) if book_summary else "(empty - this is the first chapter)"}
+        
+        DIGEST OF CHAPTER {chapter_num}:
+        {escape_placeholders(digest)}
+        
+        Merge the new chapter into the summary, keeping the narrative thread of the
+        whole book visible and giving every chapter its due weight.
+        """
+        
+        expected_output = """
+        An updated summary of the book so far, of at most 400 words.
+        """
+        
+        return Task(
+            description=description,
+            expected_output=expected_output,
+            agent=self.summarizer(),
+            context=[]
+        )
+    
+    def create_chapter_check_task(self, chapter_num: int, chapter_content: str, agent: Agent = None) -> Task:
+        """Create the map task of the map-reduce final control: check one chapter and sheet its terms and facts"""
+        
+        description = f"""
+        Final check of an approved chapter before publication. The chapter has already been
+        reviewed and revised, so do not ask for changes of style or structure. Report only what
+        would still block publication: factual errors, contradictions within the chapter,
+        confusing or wrong use of terms, and broken references to other chapters.
+        
+        Also record the terminology, names and facts the chapter uses, so the whole book can
+        be checked for consistency without reading every chapter again.
+        
+        Final check of Chapter {chapter_num}:
+        {escape_placeholders(chapter_content)}
+        """
+        
+        expected_output = f"""
+        Return ONLY a JSON object, without code fences or any text before or after it, with these fields:
+        - "chapter": {chapter_num}
+        - "findings": the problems that block publication, each an object with "priority"
+          ("HIGH", "MEDIUM" or "LOW"), "category", "location", "problem" and "suggestion";
+          an empty list if there are none
+        - "terms": an object mapping each technical term the chapter defines or relies on to
+          its meaning as used in the chapter, at most 20
+        - "names": the people, organisations, places and works the chapter names, at most 20
+        - "facts": the claims, figures and dates the chapter states, each as one short sentence
+          with the figure exactly as written, at most 20
+        """
+        
         return Task(
             description=description,
             expected_output=expected_output,
+            agent=agent or self.controller(),
+            context=[]
+        )
+    
+    def create_control_reduce_task(self, sheets: str) -> Task:
+        """Create the reduce task of the map-reduce final control: the book-wide report from the chapter sheets"""
+        control_spec = self.tasks_config['control_task']
+        
+        description = f"""
+        Perform the final quality review of the complete book from the check sheets of its
+        chapters below. Every chapter has already been checked on its own; focus on the book
+        as a unified whole and on the consistency between chapters:
+        - terms defined or used differently in different chapters
+        - names spelled or described differently
+        - facts and figures that contradict each other
+        - problems that recur in several chapters
+        
+        Use the book summary and chapter digests in the context for the narrative thread,
+        structure and coverage of the topic. Name every inconsistency with the chapters involved.
+        
+        CHAPTER CHECK SHEETS:
+        {escape_placeholders(sheets)}
+        """
+        
+        return Task(
+            description=description,
+            expected_output=control_spec['expected_output'],
             agent=self.controller(),
             context=[]
         )
     
     # ==================== ENHANCED WORKFLOW EXECUTION ====================
     
-    def run_complete_workflow(self, inputs: dict) -> str:
-        """Execute the complete book creation process with enhanced writer-controller interaction"""
+    def run_complete_workflow(self, inputs: dict, checkpoint: CheckpointStore = None, output_path: str = None) -> str:
+        """Execute the complete book creation process with enhanced writer-controller interaction.
+        
+        With a checkpoint, every completed step is saved as it finishes and steps already
+        recorded in the checkpoint are skipped, so an interrupted run resumes where it stopped.
+        With an output_path, the book is written there section by section as the steps finish
+        (see assembly.py) and the path is returned instead of the book text.
+        """
         try:
+            if checkpoint:
+                self._resume_from_checkpoint(checkpoint, inputs)
+            if output_path:
+                self._start_assembly(output_path)
+            
+            self.revision_policy = make_policy(self.revision_policy_name, inputs.get('book_length', 'medium'))
+            self.max_revision_cycles = self.revision_policy.max_cycles
+            
             # Phase 1: Research
             print("🔍 Phase 1: Research")
-            research_result = self._execute_research_phase(inputs)
+            research_result = self._run_timed_phase('research', self._execute_research_phase, inputs)
             
             # Phase 2: Design
             print("🎨 Phase 2: Design")
-            design_result = self._execute_design_phase(inputs)
+            design_result = self._run_timed_phase('design', self._execute_design_phase, inputs)
             
             # Phase 3: Enhanced Writing with immediate feedback
             print("✍️ Phase 3: Interactive Writing")
-            chapters_result = self._execute_interactive_writing_phase(inputs)
+            chapters_result = self._run_timed_phase('writing', self._execute_interactive_writing_phase, inputs)
+            if self.assembler:
+                # Every review is known once all chapters are approved
+                self.assembler.add('revision_history', self._generate_revision_summary())
+            
+            # Phase 4: Chapter digests and rolling book summary for the late phases
+            print("🗜️ Phase 4: Chapter Digests")
+            self._run_timed_phase('summaries', self._execute_summary_phase, inputs)
+            
+            # Phase 5: Write Conclusion
+            print("🏁 Phase 5: Conclusion")
+            conclusion_result = self._run_timed_phase('conclusion', self._execute_conclusion_phase, inputs)
+            
+            # Phase 6: Final Quality Control
+            print("🔍 Phase 6: Final Quality Control")
+            control_result = self._run_timed_phase('final_control', self._execute_final_control_phase, inputs)
             
-            # Phase 4: Write Conclusion
-            print("🏁 Phase 4: Conclusion")
-            conclusion_result = self._execute_conclusion_phase(inputs)
+            # Phase 7: Final Evaluation
+            print("⭐ Phase 7: Final Evaluation")
+            evaluation_result = self._run_timed_phase('evaluation', self._execute_evaluation_phase, inputs)
             
-            # Phase 5: Final Quality Control
-            print("🔍 Phase 5: Final Quality Control")
-            control_result = self._execute_final_control_phase(inputs)
+            self._report_cache_stats()
+            self._report_prefill()
+            self._report_budgets()
+            self._report_metrics()
+            self._report_profile()
             
-            # Phase 6: Final Evaluation
-            print("⭐ Phase 6: Final Evaluation")
-            evaluation_result = self._execute_evaluation_phase(inputs)
+            if self.assembler:
+                self.assembler.finish()
+                print(f"📘 Book complete in {self.assembler.path} ({len(self.assembler.sections)} sections)")
+                return str(self.assembler.path)
             
             # Compile final book
             return self._compile_final_book()
@@ -275,250 +832,1224 @@ class PublishingHouseCrew():
             print(f"❌ Error during workflow execution: {str(e)}")
             raise
     
-    def _execute_research_phase(self, inputs: dict) -> str:
-        """Execute research phase"""
-        research_task = self.research_task()
+    def reset(self) -> None:
+        """Forget the state of the previous book so the crew, its agents and LLMs can write another one"""
+        self.workflow_results = {}
+        self.checkpoint = None
+        self.assembler = None
+        self.chapter_count = 0
+        self.outline = None
+        self.context_sizes = {}
+        self.budget_usage = []
+        self.research_index = None
+        self._retrieved_passages = {}
+        self.book_state = BookState()
+        self.phase_timings = {}
+        self.metrics = {}
+        self._busy_seconds = 0.0
+        self._revision_history = {}
+        for llm in list(self._llms.values()):
+            llm.reset_timings()
+        for base_task in (self.research_task(), self.design_task(), self.conclusion_task(),
+                          self.final_control_task(), self.final_evaluation()):
+            base_task.output = None
+    
+    def _run_timed_phase(self, phase: str, phase_fn, inputs: dict):
+        """Run a workflow phase and record its wall-clock duration"""
+        if phase in self.workflow_results:
+            print(f"⏭️ Phase '{phase}' restored from checkpoint")
+            self._emit('phase_restored', phase=phase)
+            return self.workflow_results[phase]
         
-        research_crew = Crew(
-            agents=[self.researcher()],
-            tasks=[research_task],
+        self._emit('phase_started', phase=phase)
+        started = time.perf_counter()
+        with self.profiler.span(phase, "phase"):
+            result = phase_fn(inputs)
+        self.phase_timings[phase] = time.perf_counter() - started
+        print(f"⏱️ Phase '{phase}' took {self.phase_timings[phase]:.1f}s")
+        self._emit('phase_finished', phase=phase, seconds=round(self.phase_timings[phase], 2))
+        return result
+    
+    def _emit(self, event: str, **data) -> None:
+        """Pass a progress event to the progress callback, if one is set"""
+        if self.progress:
+            self.progress({'event': event, 'time': time.time(), **data})
+    
+    def _run_task(self, agent: Agent, task: Task, inputs: dict, use_cache: bool = True):
+        """Run a single-task crew while holding one of the shared LLM slots.
+        
+        Raises ContextOverflowError without calling the model when the prompt cannot fit the
+        context window of the agent, which Ollama would silently truncate.
+        """
+        task_crew = Crew(
+            agents=[agent],
+            tasks=[task],
             process=Process.sequential,
             verbose=True
         )
         
-        result = research_crew.kickoff(inputs=inputs)
-        self.workflow_results['research'] = result
+        cache_scope = self.response_cache.bypass() if self.response_cache and not use_cache else nullcontext()
+        
+        self._guard_placeholders(task, inputs)
+        with self.profiler.span(agent.role.strip(), "task") as span:
+            span.update(self._check_budget(agent, task))
+            queued = time.perf_counter()
+            with self.llm_slots, cache_scope:
+                started = time.perf_counter()
+                span['queue_wait'] = started - queued
+                result = task_crew.kickoff(inputs=inputs)
+                elapsed = time.perf_counter() - started
+        
+        with self._stats_lock:
+            self._busy_seconds += elapsed
+        return result
+    
+    @staticmethod
+    def _guard_placeholders(task: Task, inputs: dict) -> None:
+        """Escape every {name} of a task that is not a workflow input.
+        
+        crewai interpolates the description and expected output with the inputs and fails on
+        any other {name}, so text embedded by a task builder without escape_placeholders can
+        not break a run.
+        """
+        for field in ('description', 'expected_output'):
+            # Tasks that ran before are interpolated again from their original text
+            original_field = f'_original_{field}'
+            target = original_field if getattr(task, original_field, None) is not None else field
+            text = getattr(task, target)
+            if text:
+                setattr(task, target, escape_placeholders(text, keep=inputs))
+    
+    def _execute_research_phase(self, inputs: dict) -> str:
+        """Execute research phase"""
+        if self.research_mode == "fanout":
+            return self._execute_fanout_research(inputs)
+        
+        result = self._run_task(self.researcher(), self.research_task(), inputs,
+                                use_cache=self._task_uses_cache('research_task'))
+        self._save_result('research', result)
+        return result
+    
+    def _execute_fanout_research(self, inputs: dict) -> str:
+        """Research every facet listed in tasks.yaml concurrently, then merge the notes into one report"""
+        facets = self.tasks_config['research_facet_task']['facets']
+        print(f"🔀 Researching {len(facets)} facets with {self.max_workers} workers")
+        
+        def research_facet(index: int) -> str:
+            key = f'research_facet_{index}'
+            if key in self.workflow_results:
+                print(f"⏭️ Research facet {index} restored from checkpoint")
+                return self.workflow_results[key]
+            
+            print(f"🔍 Researching facet {index}/{len(facets)}: {facets[index - 1]}")
+            researcher = self.researcher().copy()
+            facet_task = self.create_research_facet_task(agent=researcher)
+            report = self._run_task(researcher, facet_task, {**inputs, 'facet': facets[index - 1]},
+                                    use_cache=self._task_uses_cache('research_facet_task'))
+            return self._save_result(key, report)
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="research") as pool:
+            reports = list(pool.map(research_facet, range(1, len(facets) + 1)))
+        
+        sources = extract_sources(*reports)
+        print(f"🔀 Merging {len(reports)} facet notes ({len(sources)} unique sources)...")
+        merge_task = self.create_research_merge_task(list(zip(facets, reports)), sources)
+        result = self._run_task(self.researcher(), merge_task, inputs,
+                                use_cache=self._task_uses_cache('research_merge_template'))
+        
+        # The design task reads the research through the research task's output
+        self._restore_task_output(self.research_task(), str(result))
+        self._save_result('research', result)
         return result
     
     def _execute_design_phase(self, inputs: dict) -> str:
         """Execute design phase"""
-        design_task = self.design_task()
-        
-        design_crew = Crew(
-            agents=[self.designer()],
-            tasks=[design_task],
-            process=Process.sequential,
-            verbose=True
-        )
+        result = self._run_task(self.designer(), self.design_task(), inputs,
+                                use_cache=self._task_uses_cache('design_task'))
         
-        result = design_crew.kickoff(inputs=inputs)
-        self.workflow_results['design'] = result
+        self.outline = self._build_outline(str(result), inputs)
+        if self.outline:
+            self.chapter_count = len(self.outline.chapters)
+            print(f"📖 Outline: \"{self.outline.title}\" with {self.chapter_count} chapters")
+            self._save_result('outline', self.outline.model_dump_json())
+        else:
+            self.chapter_count = self._extract_chapter_count(str(result), inputs.get('book_length', 'medium'))
+            print(f"📖 Detected {self.chapter_count} chapters from design")
         
-        # Extract chapter count
-        self.chapter_count = self._extract_chapter_count(str(result))
-        print(f"📖 Detected {self.chapter_count} chapters from design")
+        if self.checkpoint:
+            self.checkpoint.save('chapter_count', self.chapter_count)
+        if self.assembler:
+            self.assembler.set_chapter_count(self.chapter_count)
+        self._save_result('design', result)
         
         return result
     
+    def _build_outline(self, design: str, inputs: dict, max_attempts: int = 2):
+        """Have the designer restate the design as a validated BookOutline, or return None.
+        
+        A rejected outline is sent back once with the validation error; if that fails too,
+        the workflow falls back to the free-form design.
+        """
+        book_length = inputs.get('book_length', 'medium')
+        min_chapters, max_chapters = self.CHAPTER_RANGES.get(book_length, self.CHAPTER_RANGES['medium'])
+        error = None
+        
+        for attempt in range(1, max_attempts + 1):
+            print(f"🗂️ Structuring the design into an outline (attempt {attempt}/{max_attempts})...")
+            outline_task = self.create_outline_task(design, book_length, previous_error=error)
+            response = str(self._run_task(self.designer(), outline_task, inputs,
+                                          use_cache=self._task_uses_cache('outline_task_template')))
+            try:
+                outline = BookOutline.model_validate(extract_json(response))
+                if not min_chapters <= len(outline.chapters) <= max_chapters:
+                    raise ValueError(f"the outline has {len(outline.chapters)} chapters, a {book_length} book "
+                                     f"needs {min_chapters}-{max_chapters}")
+                return outline
+            except ValueError as e:
+                error = str(e)
+                print(f"⚠️ Outline rejected: {error.splitlines()[0]}")
+                self._bump_metric('outline_rejections')
+        
+        print("⚠️ Could not build a structured outline. Chapters will get the full design instead.")
+        return None
+    
     def _execute_interactive_writing_phase(self, inputs: dict) -> list:
         """Execute interactive writing phase with immediate controller feedback"""
-        # Get context tasks for chapters
-        research_task = self.research_task()
-        design_task = self.design_task()
-        context_tasks = [research_task, design_task]
+        started = time.perf_counter()
+        busy_before = self._busy_seconds
+        
+        if self.writing_mode == "parallel":
+            chapter_results = self._write_chapters_in_parallel(inputs)
+        elif self.writing_mode == "pipelined":
+            chapter_results = self._write_chapters_pipelined(inputs)
+        else:
+            chapter_results = self._write_chapters_sequentially(inputs)
         
+        self._report_writing_speedup(time.perf_counter() - started, self._busy_seconds - busy_before)
+        if 'retrieval' in self.phase_timings:
+            print(f"⏱️ Research retrieval took {self.phase_timings['retrieval'] * 1000:.1f}ms")
+        return chapter_results
+    
+    def _write_chapters_sequentially(self, inputs: dict) -> list:
+        """Write and review chapters one after another"""
         chapter_results = []
         
         for i in range(1, self.chapter_count + 1):
+            if f'chapter_{i}' in self.workflow_results:
+                print(f"⏭️ Chapter {i} restored from checkpoint")
+                chapter_results.append(self.workflow_results[f'chapter_{i}'])
+                self._update_book_state(i, inputs)
+                continue
+            
             print(f"\n📝 === WRITING CHAPTER {i}/{self.chapter_count} ===")
             
             # Interactive writing and review cycle
-            final_chapter = self._write_and_review_chapter(
-                chapter_num=i,
-                total_chapters=self.chapter_count,
-                context_tasks=context_tasks,
-                inputs=inputs
-            )
+            with self.profiler.span(f"Chapter {i}", "chapter", chapter=i):
+                final_chapter = self._write_and_review_chapter(
+                    chapter_num=i,
+                    total_chapters=self.chapter_count,
+                    inputs=inputs,
+                    previous_chapter=chapter_results[-1] if chapter_results else None
+                )
             
             chapter_results.append(final_chapter)
-            self.workflow_results[f'chapter_{i}'] = final_chapter
+            self._save_result(f'chapter_{i}', final_chapter)
+            self._update_book_state(i, inputs)
             
             print(f"✅ Chapter {i} completed and approved!")
         
         return chapter_results
     
-    def _write_and_review_chapter(self, chapter_num: int, total_chapters: int, context_tasks: list, inputs: dict) -> str:
-        """Write a chapter with immediate controller feedback and revision cycles"""
+    def _write_chapters_in_parallel(self, inputs: dict) -> list:
+        """Run the write/review cycles of all chapters concurrently on a bounded worker pool"""
+        print(f"🧵 Writing {self.chapter_count} chapters with {self.max_workers} workers")
+        
+        def write_chapter(chapter_num: int) -> str:
+            if f'chapter_{chapter_num}' in self.workflow_results:
+                print(f"⏭️ Chapter {chapter_num} restored from checkpoint")
+                self._update_book_state(chapter_num, inputs, summarizer=self.summarizer().copy())
+                return self.workflow_results[f'chapter_{chapter_num}']
+            
+            # Agents keep per-run executor state, so every worker gets its own copies
+            with self.profiler.span(f"Chapter {chapter_num}", "chapter", chapter=chapter_num):
+                final_chapter = self._write_and_review_chapter(
+                    chapter_num=chapter_num,
+                    total_chapters=self.chapter_count,
+                    inputs=inputs,
+                    writer=self.writer().copy(),
+                    controller=self.controller().copy()
+                )
+            self._save_result(f'chapter_{chapter_num}', final_chapter)
+            self._update_book_state(chapter_num, inputs, summarizer=self.summarizer().copy())
+            return final_chapter
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chapter") as pool:
+            futures = [pool.submit(write_chapter, i) for i in range(1, self.chapter_count + 1)]
+            chapter_results = [future.result() for future in futures]
+        
+        # Report results in chapter order regardless of completion order
+        for i in range(1, self.chapter_count + 1):
+            print(f"✅ Chapter {i} completed and approved!")
+        
+        return chapter_results
+    
+    def _write_chapters_pipelined(self, inputs: dict) -> list:
+        """Draft chapter N+1 while the controller reviews chapter N.
+        
+        The writer works through a priority queue ordered by chapter number, so revision
+        jobs sent back by the controller run before drafts of later chapters. A chapter is
+        only drafted once its predecessor has a draft to transition from. That draft may still
+        change: a chapter accepted before its predecessor is held back until the predecessor is
+        final, and if the ending it transitions from has changed materially by then, it gets
+        one more revision that rewrites its opening transition.
+        """
+        print(f"🧵 Pipelining {self.chapter_count} chapters: writer and controller run side by side")
+        
+        total_chapters = self.chapter_count
+        write_queue = queue.PriorityQueue()  # (chapter_num, revision_cycle, revision_notes, patch_base)
+        review_queue = queue.Queue()  # (chapter_num, revision_cycle, chapter_content)
+        latest_drafts = {}
+        last_reviews = {}  # chapter_num -> (reviewed draft, review)
+        transitions = {}  # draft -> ending of the predecessor it was written to follow
+        held = {}  # chapter_num -> (accepted draft, revision_cycle) waiting for its predecessor to be final
+        refreshed = set()  # Chapters whose transition was rewritten once already
+        approved = {
+            i: self.workflow_results[f'chapter_{i}']
+            for i in range(1, total_chapters + 1)
+            if f'chapter_{i}' in self.workflow_results
+        }
+        failures = []
+        stop_job = (0, 0, None, None)  # Sorts ahead of every real job
+        
+        def writer_loop():
+            try:
+                while True:
+                    job = write_queue.get()
+                    if job == stop_job:
+                        return
+                    chapter_num, revision_cycle, revision_notes, patch_base = job
+                    
+                    # Prefer the approved predecessor, fall back to its latest draft
+                    previous_chapter = approved.get(chapter_num - 1) or latest_drafts.get(chapter_num - 1)
+                    chapter_content = self._draft_chapter(
+                        chapter_num, total_chapters, inputs, revision_cycle,
+                        revision_notes=revision_notes,
+                        previous_chapter=previous_chapter,
+                        patch_base=patch_base
+                    )
+                    latest_drafts[chapter_num] = chapter_content
+                    if previous_chapter:
+                        transitions[chapter_content] = self._chapter_ending(previous_chapter)
+                    review_queue.put((chapter_num, revision_cycle, chapter_content))
+                    
+                    next_chapter = self._next_unwritten_chapter(chapter_num, approved)
+                    if revision_cycle == 1 and next_chapter:
+                        write_queue.put((next_chapter, 1, None, None))
+            except Exception as e:
+                failures.append(e)
+                review_queue.put(None)
+        
+        def finish(chapter_num, chapter_content, revision_cycle):
+            """Approve an accepted chapter once its predecessor is final and its transition still fits"""
+            previous = chapter_num - 1
+            if previous >= 1 and previous not in approved:
+                held[chapter_num] = (chapter_content, revision_cycle)
+                return
+            if (previous >= 1 and chapter_num not in refreshed
+                    and self._transition_is_stale(transitions.get(chapter_content), approved[previous])):
+                refreshed.add(chapter_num)
+                print(f"🔗 Chapter {previous} changed after Chapter {chapter_num} was drafted from it; "
+                      f"rewriting the opening transition of Chapter {chapter_num}")
+                self._bump_metric('transition_refreshes')
+                notes = (f"- [HIGH] (opening) Chapter {previous} was revised after this chapter was written, so its "
+                         f"opening transition refers to an ending that is no longer in the book -> Rewrite the opening "
+                         f"transition to follow the final ending of Chapter {previous}; leave the rest of the chapter as it is")
+                write_queue.put((chapter_num, revision_cycle + 1, notes, chapter_content))
+                return
+            approved[chapter_num] = self._save_result(f'chapter_{chapter_num}', chapter_content)
+            self._update_book_state(chapter_num, inputs)
+            if chapter_num + 1 in held:
+                finish(chapter_num + 1, *held.pop(chapter_num + 1))
+        
+        def reviewer_loop():
+            try:
+                while len(approved) < total_chapters:
+                    job = review_queue.get()
+                    if job is None:
+                        return
+                    chapter_num, revision_cycle, chapter_content = job
+                    
+                    previous_draft, previous_review = last_reviews.get(chapter_num, (None, None))
+                    review_content, verdict = self._review_chapter(
+                        chapter_num, chapter_content, inputs,
+                        previous_draft=previous_draft,
+                        previous_review=previous_review,
+                        revision_cycle=revision_cycle
+                    )
+                    if verdict.source == "controller":
+                        last_reviews[chapter_num] = (chapter_content, review_content)
+                    else:
+                        last_reviews.pop(chapter_num, None)
+                    accepted = self._accept_chapter(chapter_num, chapter_content, verdict, revision_cycle)
+                    if accepted is not None:
+                        finish(chapter_num, accepted, revision_cycle)
+                        continue
+                    
+                    revision_notes = self._record_revision_request(chapter_num, revision_cycle, review_content, verdict)
+                    patch_base = chapter_content if verdict.decision == "MINOR_REVISIONS" else None
+                    write_queue.put((chapter_num, revision_cycle + 1, revision_notes, patch_base))
+            except Exception as e:
+                failures.append(e)
+            finally:
+                write_queue.put(stop_job)
+        
+        for chapter_num in sorted(approved):
+            self._update_book_state(chapter_num, inputs)
+        
+        first_chapter = self._next_unwritten_chapter(0, approved)
+        if first_chapter:
+            write_queue.put((first_chapter, 1, None, None))
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline") as pool:
+                pool.submit(writer_loop)
+                pool.submit(reviewer_loop)
+        
+        if failures:
+            raise failures[0]
+        
+        chapter_results = [approved[i] for i in range(1, total_chapters + 1)]
+        for i in range(1, total_chapters + 1):
+            print(f"✅ Chapter {i} completed and approved!")
+        
+        return chapter_results
+    
+    def _transition_is_stale(self, followed_ending: str, previous_chapter: str) -> bool:
+        """Whether the final ending of a chapter differs materially from the ending its successor was drafted to follow"""
+        if not followed_ending:
+            return False
+        changed = diff_drafts(followed_ending, self._chapter_ending(previous_chapter))['changed_ratio']
+        return changed > self.TRANSITION_STALE_RATIO
+    
+    def _report_writing_speedup(self, wall_seconds: float, busy_seconds: float) -> None:
+        """Compare the writing phase wall time against the time its LLM calls would take back to back.
         
+        Local work and waits between calls are left out, so both numbers are estimates and
+        go to the metrics; phase_timings only holds measured wall times.
+        """
+        speedup = busy_seconds / wall_seconds if wall_seconds > 0 else 1.0
+        with self._stats_lock:
+            self.metrics['writing_llm_seconds_estimated'] = round(busy_seconds, 1)
+            self.metrics['writing_speedup_estimated'] = round(speedup, 2)
+        print(f"⏱️ Writing phase ({self.writing_mode}): {wall_seconds:.1f}s wall, {busy_seconds:.1f}s of LLM calls "
+              f"back to back, estimated {speedup:.2f}x speedup")
+    
+    def _write_and_review_chapter(self, chapter_num: int, total_chapters: int, inputs: dict,
+                                  previous_chapter: str = None, writer: Agent = None, controller: Agent = None) -> str:
+        """Write a chapter with immediate controller feedback and revision cycles"""
         revision_cycle = 0
         revision_notes = None
+        chapter_content = None
+        review_content = None
+        verdict = None
         
-        while revision_cycle < self.max_revision_cycles:
+        # The revision policy ends the loop, at the latest on its last cycle
+        while True:
             revision_cycle += 1
+            previous_draft = chapter_content
+            # Drafts bounced by the linter were never seen by the controller, so they get a full review
+            previous_review = review_content if verdict and verdict.source == "controller" else None
             
-            # Write/revise the chapter
-            if revision_cycle == 1:
-                print(f"📝 Writing initial draft of Chapter {chapter_num}...")
-            else:
-                print(f"🔄 Revision cycle {revision_cycle-1} for Chapter {chapter_num}...")
-            
-            chapter_task = self.create_chapter_task(
-                chapter_num=chapter_num,
-                total_chapters=total_chapters,
-                context_tasks=context_tasks,
-                revision_notes=revision_notes
+            chapter_content = self._draft_chapter(
+                chapter_num, total_chapters, inputs, revision_cycle,
+                revision_notes=revision_notes,
+                previous_chapter=previous_chapter,
+                patch_base=previous_draft if verdict and verdict.decision == "MINOR_REVISIONS" else None,
+                writer=writer
             )
             
-            chapter_crew = Crew(
-                agents=[self.writer()],
-                tasks=[chapter_task],
-                process=Process.sequential,
-                verbose=True
+            review_content, verdict = self._review_chapter(
+                chapter_num, chapter_content, inputs,
+                previous_draft=previous_draft,
+                previous_review=previous_review,
+                controller=controller,
+                revision_cycle=revision_cycle
             )
             
-            chapter_result = chapter_crew.kickoff(inputs=inputs)
-            chapter_content = str(chapter_result)
+            accepted = self._accept_chapter(chapter_num, chapter_content, verdict, revision_cycle)
+            if accepted is not None:
+                return accepted
             
-            # Controller reviews the chapter
-            print(f"🔍 Controller reviewing Chapter {chapter_num}...")
+            # Extract revision notes for next cycle
+            revision_notes = self._record_revision_request(chapter_num, revision_cycle, review_content, verdict)
+    
+    def _draft_chapter(self, chapter_num: int, total_chapters: int, inputs: dict, revision_cycle: int,
+                       revision_notes: str = None, previous_chapter: str = None, patch_base: str = None,
+                       writer: Agent = None) -> str:
+        """Write the initial draft of a chapter or revise it with the controller's notes.
+        
+        With a patch_base (the draft that got MINOR_REVISIONS) the writer only returns
+        paragraph edits, which are applied locally; a full rewrite is the fallback.
+        """
+        writer = writer or self.writer()
+        
+        if revision_cycle == 1:
+            print(f"📝 Writing initial draft of Chapter {chapter_num}...")
+        else:
+            print(f"🔄 Revision cycle {revision_cycle-1} for Chapter {chapter_num}...")
+        
+        with self.profiler.span(f"Chapter {chapter_num} draft", "chapter", chapter=chapter_num, cycle=revision_cycle) as span:
+            if patch_base and revision_notes and self.patch_revisions:
+                patched = self._patch_chapter(chapter_num, patch_base, revision_notes, inputs, writer)
+                if patched:
+                    span['kind'] = "patch"
+                    return patched
             
-            review_task = self.create_chapter_review_task(chapter_num, chapter_content)
+            span['kind'] = "rewrite" if revision_notes else "draft"
             
-            review_crew = Crew(
-                agents=[self.controller()],
-                tasks=[review_task],
-                process=Process.sequential,
-                verbose=True
+            chapter_task = self.create_chapter_task(
+                chapter_num=chapter_num,
+                total_chapters=total_chapters,
+                context_blocks=self._chapter_context_blocks(chapter_num),
+                revision_notes=revision_notes,
+                previous_chapter_ending=self._chapter_ending(previous_chapter) if previous_chapter else None,
+                target_words=self.outline.chapter(chapter_num).target_words if self.outline else None,
+                agent=writer
             )
             
-            review_result = review_crew.kickoff(inputs=inputs)
-            review_content = str(review_result)
+            chapter_result = self._run_task(writer, chapter_task, inputs,
+                                            use_cache=self._task_uses_cache('chapter_task_template'))
+            return str(chapter_result)
+    
+    def _patch_chapter(self, chapter_num: int, chapter_content: str, revision_notes: str, inputs: dict,
+                       writer: Agent) -> str:
+        """Ask the writer for targeted paragraph edits and merge them into the draft, or return None"""
+        print(f"🩹 Requesting paragraph edits for Chapter {chapter_num}...")
+        
+        patch_task = self.create_chapter_patch_task(chapter_num, chapter_content, revision_notes,
+                                                    self._chapter_context_blocks(chapter_num), agent=writer)
+        patch_response = str(self._run_task(writer, patch_task, inputs,
+                                            use_cache=self._task_uses_cache('chapter_task_template')))
+        
+        edits = parse_edits(patch_response)
+        try:
+            patched = apply_edits(chapter_content, edits)
+        except PatchError as e:
+            print(f"⚠️ Could not apply edits to Chapter {chapter_num} ({e}). Falling back to a full rewrite...")
+            self._bump_metric('patch_fallbacks')
+            return None
+        
+        print(f"🩹 Applied {len(edits)} edits to Chapter {chapter_num}")
+        self._bump_metric('patch_revisions')
+        self._bump_metric('output_tokens_saved', max(estimate_tokens(chapter_content) - estimate_tokens(patch_response), 0))
+        return patched
+    
+    def _review_chapter(self, chapter_num: int, chapter_content: str, inputs: dict, previous_draft: str = None,
+                        previous_review: str = None, controller: Agent = None, revision_cycle: int = None) -> tuple:
+        """Have the controller review a chapter draft, returning the review and its ReviewVerdict.
+        
+        The draft is linted first: clear defects are sent back to the writer without calling the
+        controller, other findings are handed to the controller so it does not look for them again.
+        When the previous draft and its review are known and the revision changed only part of
+        the chapter, the controller re-reviews just the changed passages.
+        """
+        controller = controller or self.controller()
+        
+        with self.profiler.span(f"Chapter {chapter_num} review", "chapter", chapter=chapter_num, cycle=revision_cycle) as span:
+            lint_issues = lint_chapter(chapter_content, self.outline.chapter(chapter_num).target_words if self.outline else None)
+            if any(issue.priority == "HIGH" for issue in lint_issues):
+                verdict = ReviewVerdict(
+                    decision="MAJOR_REVISIONS",
+                    summary="Automatic checks found defects that must be fixed before an editorial review.",
+                    issues=lint_issues,
+                    source="linter"
+                )
+                print(f"🧹 Chapter {chapter_num} failed automatic checks, sending it back without a review:\n"
+                      f"{lint_report(lint_issues)}")
+                self._bump_metric('lint_bounces')
+                self._bump_metric('llm_calls_avoided')
+                span.update(kind="lint_bounce", decision=verdict.decision)
+                return verdict.model_dump_json(exclude={'source'}), verdict
+            findings = lint_report(lint_issues)
+            
+            make_review_task = None
+            if previous_draft and previous_review:
+                diff = diff_drafts(previous_draft, chapter_content)
+                if diff['changed_ratio'] <= self.incremental_review_max_change:
+                    print(f"🔍 Controller re-reviewing changes to Chapter {chapter_num} "
+                          f"({diff['changed_ratio']:.0%} of the chapter changed)...")
+                    make_review_task = lambda reviewer: self.create_chapter_incremental_review_task(
+                        chapter_num, previous_review, diff, lint_findings=findings, agent=reviewer
+                    )
+                    # The full review would carry the whole chapter instead of the review and the diff
+                    incremental_tokens = estimate_tokens(previous_review + diff['summary'] + diff['changed_passages'])
+                    self._bump_metric('incremental_reviews')
+                    self._bump_metric('review_tokens_saved', max(estimate_tokens(chapter_content) - incremental_tokens, 0))
+                    span['kind'] = "incremental"
+                else:
+                    print(f"🔍 {diff['changed_ratio']:.0%} of Chapter {chapter_num} changed, falling back to a full review")
             
-            # Parse the review decision
-            decision = self._parse_review_decision(review_content)
+            if make_review_task is None:
+                print(f"🔍 Controller reviewing Chapter {chapter_num}...")
+                make_review_task = lambda reviewer: self.create_chapter_review_task(
+                    chapter_num, chapter_content, self._chapter_context_blocks(chapter_num, draft=chapter_content),
+                    lint_findings=findings, agent=reviewer
+                )
+                self._bump_metric('full_reviews')
+                span['kind'] = "full"
             
-            print(f"📊 Review Decision: {decision}")
+            verdict = None
+            if self.review_cascade:
+                verdict, verdict_content, review_content = self._first_pass_review(chapter_num, make_review_task, inputs)
+                span['reviewer'] = "first_pass" if verdict else "escalated"
             
-            if decision == "APPROVED":
-                print(f"✅ Chapter {chapter_num} approved on cycle {revision_cycle}!")
-                return chapter_content
-            elif decision == "MINOR_REVISIONS" and revision_cycle >= 2:
-                print(f"⚠️ Chapter {chapter_num} has minor issues but reached revision limit. Accepting...")
-                return chapter_content
-            elif decision == "REJECT" and revision_cycle >= self.max_revision_cycles:
-                print(f"❌ Chapter {chapter_num} still has major issues after {self.max_revision_cycles} cycles. Accepting current version...")
-                return chapter_content
-            else:
-                # Extract revision notes for next cycle
-                revision_notes = self._extract_revision_notes(review_content)
-                print(f"🔄 Chapter {chapter_num} needs revision. Cycle {revision_cycle}/{self.max_revision_cycles}")
+            if verdict is None:
+                review_result = self._run_task(controller, make_review_task(controller), inputs,
+                                               use_cache=self._task_uses_cache('chapter_review_template'))
+                review_content = str(review_result)
                 
-                # Store the review for reference
-                self.workflow_results[f'chapter_{chapter_num}_review_{revision_cycle}'] = review_content
+                # Parse the review verdict
+                verdict, verdict_content = self._read_review_verdict(chapter_num, review_content, inputs, controller)
+            self._count_keyword_misreads(verdict)
+            # The controller was told not to repeat the linter findings, so add them for the writer
+            verdict.issues.extend(lint_issues)
+            print(f"📊 Review Decision: {verdict.decision} (Chapter {chapter_num}, {len(verdict.issues)} issues)")
+            span.update(decision=verdict.decision, issues=len(verdict.issues))
+            
+            return verdict_content, verdict
+    
+    def _count_keyword_misreads(self, verdict: ReviewVerdict) -> None:
+        """Count verdicts whose decision keyword matching on their prose would have got wrong.
+        
+        The prose is the summary and the issues, as a free-form review would have written them;
+        the raw JSON always names the decision, so keyword matching on it would agree. Prose
+        without any decision keyword is not counted: the guess would only be the default.
+        """
+        prose = '\n'.join([verdict.summary] + [f"{issue.problem} {issue.suggestion}" for issue in verdict.issues])
+        if not any(keyword in prose.upper() for keyword in ("APPROVED", "MINOR REVISIONS", "MINOR_REVISIONS",
+                                                            "MAJOR REVISIONS", "MAJOR_REVISIONS", "REJECT")):
+            return
+        guessed = self._parse_review_decision(prose)
+        if verdict.decision == "APPROVED" and guessed != "APPROVED":
+            # The chapter would have been sent back for another cycle
+            self._bump_metric('revision_cycles_saved')
+        elif verdict.decision != "APPROVED" and guessed == "APPROVED":
+            # A chapter with open issues would have been accepted, e.g. on "not yet approved"
+            self._bump_metric('false_approvals_avoided')
+    
+    def _first_pass_review(self, chapter_num: int, make_review_task, inputs: dict) -> tuple:
+        """Review a chapter with the first-pass controller model.
+        
+        Returns the verdict, the text it was read from and the raw review, or three Nones when
+        the verdict is uncertain and the review must be escalated to the main controller model.
+        """
+        reviewer = self._first_pass_controller()
+        review_content = str(self._run_task(reviewer, make_review_task(reviewer), inputs,
+                                            use_cache=self._task_uses_cache('chapter_review_template')))
+        verdict, verdict_content = self._read_review_verdict(chapter_num, review_content, inputs, reviewer,
+                                                             max_repairs=0, fallback=False)
+        
+        reason = self._escalation_reason(verdict)
+        if reason:
+            print(f"⬆️ First-pass review of Chapter {chapter_num} escalated to the main controller model: {reason}")
+            self._bump_metric('cascade_escalations')
+            return None, None, None
+        
+        self._bump_metric('cascade_first_pass_verdicts')
+        return verdict, verdict_content, review_content
+    
+    @staticmethod
+    def _escalation_reason(verdict: ReviewVerdict) -> str:
+        """Why a first-pass verdict cannot be trusted, or None if it can"""
+        if verdict is None:
+            return "no valid verdict"
+        if verdict.decision in ("MAJOR_REVISIONS", "REJECT"):
+            # A rewrite costs far more than a second review, so it is confirmed first
+            return f"{verdict.decision} must be confirmed"
+        if verdict.decision == "APPROVED" and any(issue.priority == "HIGH" for issue in verdict.issues):
+            return "approved despite HIGH priority issues"
+        return None
+    
+    def _read_review_verdict(self, chapter_num: int, review_content: str, inputs: dict, controller: Agent,
+                             max_repairs: int = 1, fallback: bool = True) -> tuple:
+        """Parse a review into a ReviewVerdict, asking the controller to restate it if it is malformed.
         
-        # If we've exhausted all revision cycles, return the last version
-        print(f"⏰ Maximum revision cycles reached for Chapter {chapter_num}. Using final version.")
+        Returns the verdict and the text it was read from. If the review still cannot be parsed
+        after max_repairs attempts, the decision is guessed from keywords in the original review,
+        or the verdict is None without a fallback.
+        """
+        response = review_content
+        for attempt in range(max_repairs + 1):
+            try:
+                return ReviewVerdict.model_validate(extract_json(response)), response
+            except ValueError as e:
+                error = str(e)
+            
+            if attempt < max_repairs:
+                print(f"⚠️ Review of Chapter {chapter_num} is not a valid verdict ({error.splitlines()[0]}). "
+                      f"Asking the controller to restate it...")
+                self._bump_metric('verdict_repairs')
+                repair_task = self.create_review_repair_task(chapter_num, response, error, agent=controller)
+                response = str(self._run_task(controller, repair_task, inputs,
+                                              use_cache=self._task_uses_cache('review_repair_template')))
+        
+        if not fallback:
+            return None, response
+        print(f"⚠️ Could not read a verdict for Chapter {chapter_num}. Falling back to keyword matching")
+        self._bump_metric('verdict_fallbacks')
+        # Skip validation: the whole review becomes the revision notes
+        verdict = ReviewVerdict.model_construct(
+            decision=self._parse_review_decision(review_content),
+            summary=review_content,
+            issues=[],
+            resolved_issues=[]
+        )
+        return verdict, review_content
+    
+    def _accept_chapter(self, chapter_num: int, chapter_content: str, verdict: ReviewVerdict,
+                        revision_cycle: int) -> str:
+        """Ask the revision policy whether a chapter is final, given its history; returns the accepted draft or None"""
+        history = self._revision_history.setdefault(chapter_num, [])
+        history.append(RevisionRound(revision_cycle, chapter_content, verdict, history[-1] if history else None))
+        decision = self.revision_policy.decide(history)
+        
+        latest = history[-1]
+        similarity = f", {latest.similarity:.0%} similar to the previous draft" if latest.similarity is not None else ""
+        print(f"🧭 Revision policy ({self.revision_policy.name}) on Chapter {chapter_num}, cycle {revision_cycle}: "
+              f"{verdict.decision}, issue score {latest.issue_score}{similarity} -> "
+              f"{'accept' if decision.accept else 'revise'} ({decision.reason})")
+        
+        if decision.accept and decision.stalled:
+            saved = self.max_revision_cycles - revision_cycle
+            self._bump_metric('policy_stops')
+            self._bump_metric('policy_cycles_saved', saved)
+            print(f"🛑 Chapter {chapter_num} stopped converging; accepting it and saving up to {saved} revision cycles")
+        elif decision.accept and verdict.decision == "APPROVED":
+            print(f"✅ Chapter {chapter_num} approved on cycle {revision_cycle}!")
+        elif decision.accept:
+            print(f"⚠️ Chapter {chapter_num} still has {verdict.decision} issues on cycle {revision_cycle}. Accepting...")
+        if not decision.accept:
+            return None
+        if decision.best:
+            print(f"↩️ Chapter {chapter_num} got worse on revision; restoring the draft of cycle {decision.best.cycle} "
+                  f"(issue score {decision.best.issue_score} instead of {latest.issue_score})")
+            self._bump_metric('policy_restored_drafts')
+            return decision.best.draft
         return chapter_content
     
-    def _execute_conclusion_phase(self, inputs: dict) -> str:
-        """Execute conclusion writing phase"""
-        # Build context with all previous work
-        all_previous_tasks = [
-            self.research_task(),
-            self.design_task()
-        ]
+    def _record_revision_request(self, chapter_num: int, revision_cycle: int, review_content: str,
+                                 verdict: ReviewVerdict) -> str:
+        """Store a review that asked for changes and return the notes for the writer"""
+        print(f"🔄 Chapter {chapter_num} needs revision. Cycle {revision_cycle}/{self.max_revision_cycles}")
         
-        # Add approved chapters to context
-        for i in range(1, self.chapter_count + 1):
-            chapter_task = self.create_chapter_task(i, self.chapter_count)
-            all_previous_tasks.append(chapter_task)
+        # Store the review for reference
+        self._save_result(f'chapter_{chapter_num}_review_{revision_cycle}', review_content)
         
-        conclusion_task = self.conclusion_task()
-        conclusion_task.context = all_previous_tasks
+        return self._extract_revision_notes(verdict)
+    
+    def _update_book_state(self, chapter_num: int, inputs: dict, summarizer: Agent = None) -> None:
+        """Record what an approved chapter adds to the book state, once per chapter"""
+        key = f'chapter_{chapter_num}_state'
+        if not self.track_book_state or key in self.workflow_results:
+            return
         
-        conclusion_crew = Crew(
-            agents=[self.writer()],
-            tasks=[conclusion_task],
-            process=Process.sequential,
-            verbose=True
+        print(f"📚 Recording the book state of Chapter {chapter_num}...")
+        summarizer = summarizer or self.summarizer()
+        state_task = self.create_chapter_state_task(
+            chapter_num, self.workflow_results[f'chapter_{chapter_num}'], self.book_state.open_threads(), agent=summarizer
         )
+        response = self._save_result(key, self._run_task(summarizer, state_task, inputs,
+                                                         use_cache=self._task_uses_cache('chapter_state_template')))
+        if self._merge_book_state(chapter_num, response):
+            print(f"📚 Book state after Chapter {chapter_num}: {self.book_state.stats()}")
+    
+    def _merge_book_state(self, chapter_num: int, response: str) -> bool:
+        """Merge a recorded chapter state into the book state; an unreadable one is skipped"""
+        try:
+            state = ChapterState.model_validate(extract_json(response))
+        except ValueError as e:
+            print(f"⚠️ Book state of Chapter {chapter_num} could not be read ({str(e).splitlines()[0]}). Skipping it")
+            self._bump_metric('book_state_fallbacks')
+            return False
+        state.chapter = chapter_num
+        self.book_state.update(state)
+        return True
+    
+    def _execute_summary_phase(self, inputs: dict) -> str:
+        """Digest every approved chapter and fold the digests into a rolling book summary"""
+        
+        def digest_chapter(chapter_num: int) -> str:
+            key = f'chapter_{chapter_num}_digest'
+            if key in self.workflow_results:
+                return self.workflow_results[key]
+            
+            print(f"🗜️ Digesting Chapter {chapter_num}...")
+            summarizer = self.summarizer().copy()
+            digest_task = self.create_chapter_digest_task(
+                chapter_num, self.workflow_results[f'chapter_{chapter_num}'], agent=summarizer
+            )
+            digest = self._run_task(summarizer, digest_task, inputs,
+                                    use_cache=self._task_uses_cache('chapter_digest_template'))
+            return self._save_result(key, digest)
+        
+        # Digests are independent of each other; the rolling summary must follow chapter order
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="digest") as pool:
+            digests = list(pool.map(digest_chapter, range(1, self.chapter_count + 1)))
+        
+        summarized = int(self.workflow_results.get('book_summary_chapters', 0))
+        book_summary = self.workflow_results.get('book_summary', '')
+        
+        for chapter_num in range(summarized + 1, self.chapter_count + 1):
+            print(f"🗜️ Adding Chapter {chapter_num} to the book summary...")
+            summary_task = self.create_book_summary_task(chapter_num, book_summary, digests[chapter_num - 1])
+            book_summary = self._save_result('book_summary', self._run_task(
+                self.summarizer(), summary_task, inputs,
+                use_cache=self._task_uses_cache('book_summary_template')
+            ))
+            self._save_result('book_summary_chapters', chapter_num)
+        
+        return book_summary
+    
+    def _build_late_phase_context(self, phase: str, task: Task, extra_sections: list = None) -> list:
+        """Build a bounded context for the late phases from the book summary and chapter digests.
+        
+        Sections are added in priority order until the token budget is used up: the rolling
+        summary, then the chapter digests, then phase-specific material such as the design.
+        The budget is --context-budget, or what the agent's context window leaves if that is less.
+        """
+        digests = '\n\n'.join(
+            f"Chapter {i}: {self.workflow_results.get(f'chapter_{i}_digest', 'No digest available')}"
+            for i in range(1, self.chapter_count + 1)
+        )
+        sections = [
+            ("BOOK SUMMARY", self.workflow_results.get('book_summary', '')),
+            ("CHAPTER DIGESTS", digests)
+        ] + (extra_sections or [])
         
-        result = conclusion_crew.kickoff(inputs=inputs)
-        self.workflow_results['conclusion'] = result
+        budget = self._budget_for(task.agent)
+        fixed_tokens = self._fixed_prompt_tokens(task.agent, task, budget)
+        context_budget = min(self.context_budget_tokens, max(budget.limit - fixed_tokens, 0))
+        context_text, context_tokens, omitted = fit_to_budget(sections, context_budget, count=budget.count)
+        
+        prompt_tokens = fixed_tokens + context_tokens
+        self.context_sizes[phase] = prompt_tokens
+        print(f"📏 {phase} prompt: {prompt_tokens} tokens "
+              f"(context {context_tokens}/{context_budget} budget)"
+              + (f", trimmed: {', '.join(omitted)}" if omitted else ""))
+        
+        return [self._context_task(f"Book context for {phase}", context_text)]
+    
+    def _execute_conclusion_phase(self, inputs: dict) -> str:
+        """Execute conclusion writing phase"""
+        conclusion_task = self.conclusion_task()
+        conclusion_task.context = self._build_late_phase_context('conclusion', conclusion_task, [
+            ("BOOK DESIGN", self.workflow_results.get('design', ''))
+        ])
+        
+        result = self._run_task(self.writer(), conclusion_task, inputs,
+                                use_cache=self._task_uses_cache('conclusion_task'))
+        self._save_result('conclusion', result)
         return result
     
     def _execute_final_control_phase(self, inputs: dict) -> str:
         """Execute final quality control phase on the complete book"""
-        # Build context with all completed content
-        all_tasks = [
-            self.research_task(),
-            self.design_task(),
-            self.conclusion_task()
-        ]
-        
-        # Add all approved chapters
-        for i in range(1, self.chapter_count + 1):
-            chapter_task = self.create_chapter_task(i, self.chapter_count)
-            all_tasks.append(chapter_task)
+        if self.final_control_mode == "mapreduce":
+            return self._execute_mapreduce_final_control(inputs)
         
         control_task = self.final_control_task()
-        control_task.context = all_tasks
+        control_task.context = self._build_late_phase_context('final_control', control_task, [
+            ("CONCLUSION", self.workflow_results.get('conclusion', '')),
+            ("BOOK DESIGN", self.workflow_results.get('design', ''))
+        ])
         
-        control_crew = Crew(
-            agents=[self.controller()],
-            tasks=[control_task],
-            process=Process.sequential,
-            verbose=True
-        )
+        result = self._run_task(self.controller(), control_task, inputs,
+                                use_cache=self._task_uses_cache('control_task'))
+        self._save_result('final_control', result)
+        return result
+    
+    def _execute_mapreduce_final_control(self, inputs: dict) -> str:
+        """Check every chapter concurrently, then review the consistency of the book from the check sheets.
+        
+        The map calls each carry one chapter, so the phase takes about as long as the slowest
+        chapter check plus one reduce call. The sheets are fitted into what the controller's
+        context window leaves next to the book summary and digests; a book with too many
+        chapters for even the most compact sheets fails before any chapter is checked.
+        """
+        sheet_budget = self._check_sheet_budget()
+        print(f"🔎 Checking {self.chapter_count} chapters with {self.max_workers} workers "
+              f"(~{sheet_budget} tokens for the check sheets)")
+        
+        def check_chapter(chapter_num: int) -> str:
+            key = f'final_check_{chapter_num}'
+            if key in self.workflow_results:
+                print(f"⏭️ Final check of Chapter {chapter_num} restored from checkpoint")
+                return self.workflow_results[key]
+            
+            print(f"🔎 Final check of Chapter {chapter_num}...")
+            controller = self.controller().copy()
+            check_task = self.create_chapter_check_task(
+                chapter_num, self.workflow_results[f'chapter_{chapter_num}'], agent=controller
+            )
+            check = self._run_task(controller, check_task, inputs,
+                                   use_cache=self._task_uses_cache('chapter_check_template'))
+            return self._save_result(key, check)
         
-        result = control_crew.kickoff(inputs=inputs)
-        self.workflow_results['final_control'] = result
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="check") as pool:
+            checks = list(pool.map(check_chapter, range(1, self.chapter_count + 1)))
+        
+        sheets = self._fit_check_sheets(checks, sheet_budget)
+        print(f"🔎 Reviewing the consistency of the book from {len(checks)} check sheets "
+              f"(~{estimate_tokens(sheets)} tokens)...")
+        reduce_task = self.create_control_reduce_task(sheets)
+        reduce_task.context = self._build_late_phase_context('final_control', reduce_task, [
+            ("CONCLUSION", self.workflow_results.get('conclusion', '')),
+            ("BOOK DESIGN", self.workflow_results.get('design', ''))
+        ])
+        
+        result = self._run_task(self.controller(), reduce_task, inputs,
+                                use_cache=self._task_uses_cache('control_reduce_template'))
+        self._save_result('final_control', result)
         return result
     
+    def _check_sheet_budget(self) -> int:
+        """Tokens the reduce prompt leaves for the check sheets next to the book summary and digests.
+        
+        Raises ContextOverflowError if not even the most compact sheet of every chapter fits.
+        """
+        controller = self.controller()
+        budget = self._budget_for(controller)
+        fixed = self._fixed_prompt_tokens(controller, self.create_control_reduce_task(''), budget)
+        # The book summary and digests keep their share of the window
+        book_context = min(self.context_budget_tokens, budget.limit // 3)
+        available = budget.limit - fixed - book_context
+        needed = self.chapter_count * self.MIN_SHEET_TOKENS
+        if available < needed:
+            self._bump_metric('calls_refused_over_budget')
+            raise ContextOverflowError(
+                f"The map-reduce final control needs at least {needed} tokens for the check sheets of "
+                f"{self.chapter_count} chapters, but {budget.model} leaves {max(available, 0)} next to the book "
+                f"context (num_ctx {budget.num_ctx}). Raise the controller's num_ctx or use --final-control single"
+            )
+        return available
+    
+    def _fit_check_sheets(self, checks: list, budget_tokens: int) -> str:
+        """Render the check sheets of all chapters as compactly as needed to fit budget_tokens.
+        
+        Each step of SHEET_LEVELS keeps fewer entries per list and drops lower-priority findings;
+        if even the last one is too long, every sheet is cut to an equal share.
+        """
+        count = self._budget_for(self.controller()).count
+        parsed = [self._parse_chapter_check(number, check) for number, check in enumerate(checks, 1)]
+        for level, (limit, priorities) in enumerate(self.SHEET_LEVELS):
+            sheets = [check.render(limit, priorities) if isinstance(check, ChapterCheck) else check for check in parsed]
+            text = '\n\n'.join(sheets)
+            if count(text) <= budget_tokens:
+                if level:
+                    print(f"✂️ Check sheets shortened to {limit} entries per list and "
+                          f"{'/'.join(priorities)} findings to fit {budget_tokens} tokens")
+                    self._bump_metric('check_sheet_trims')
+                return text
+        
+        share = budget_tokens // len(sheets) - 5
+        print(f"✂️ Check sheets cut to ~{share} tokens each to fit {budget_tokens} tokens")
+        self._bump_metric('check_sheet_trims')
+        return '\n\n'.join(cut_to_tokens(sheet, share, count) for sheet in sheets)
+    
+    def _parse_chapter_check(self, chapter_num: int, check_response: str):
+        """Read a chapter check as a ChapterCheck; an unreadable check is passed on as shortened text"""
+        try:
+            check = ChapterCheck.model_validate(extract_json(check_response))
+        except ValueError as e:
+            print(f"⚠️ Final check of Chapter {chapter_num} is not a valid check sheet ({str(e).splitlines()[0]}). "
+                  f"Passing it on as text")
+            self._bump_metric('check_sheet_fallbacks')
+            return f"CHAPTER {chapter_num}\n{cut_to_tokens(check_response.strip(), 300)}"
+        check.chapter = chapter_num
+        return check
+    
     def _execute_evaluation_phase(self, inputs: dict) -> str:
         """Execute final evaluation phase"""
-        # Build context with all tasks including final control
-        all_tasks = [
-            self.research_task(),
-            self.design_task(),
-            self.conclusion_task(),
-            self.final_control_task()
-        ]
-        
-        # Add all chapters
-        for i in range(1, self.chapter_count + 1):
-            chapter_task = self.create_chapter_task(i, self.chapter_count)
-            all_tasks.append(chapter_task)
-        
         eval_task = self.final_evaluation()
-        eval_task.context = all_tasks
+        eval_task.context = self._build_late_phase_context('evaluation', eval_task, [
+            ("FINAL QUALITY CONTROL REPORT", self.workflow_results.get('final_control', '')),
+            ("CONCLUSION", self.workflow_results.get('conclusion', '')),
+            ("BOOK DESIGN", self.workflow_results.get('design', ''))
+        ])
         
-        eval_crew = Crew(
-            agents=[self.director()],
-            tasks=[eval_task],
-            process=Process.sequential,
-            verbose=True
+        result = self._run_task(self.director(), eval_task, inputs,
+                                use_cache=self._task_uses_cache('final_evaluation'))
+        self._save_result('evaluation', result)
+        return result
+    
+    # ==================== CHECKPOINTING ====================
+    
+    def _save_result(self, key: str, result) -> str:
+        """Record the final text of a workflow step in memory and in the checkpoint"""
+        text = str(result)
+        self.workflow_results[key] = text
+        if self.checkpoint:
+            self.checkpoint.save(key, text)
+        if self.assembler:
+            self.assembler.add(key, text)
+        
+        chapter = re.fullmatch(r'chapter_(\d+)(?:_review_(\d+))?', key)
+        if chapter and chapter.group(2):
+            self._emit('chapter_reviewed', chapter=int(chapter.group(1)), cycle=int(chapter.group(2)))
+        elif chapter:
+            self._emit('chapter_approved', chapter=int(chapter.group(1)), of=self.chapter_count,
+                       words=len(text.split()))
+        else:
+            self._emit('step_saved', key=key)
+        return text
+    
+    def _resume_from_checkpoint(self, checkpoint: CheckpointStore, inputs: dict) -> None:
+        """Attach a checkpoint and restore the steps it already contains"""
+        self.checkpoint = checkpoint
+        records = checkpoint.load()
+        if 'inputs' not in records:
+            checkpoint.save('inputs', inputs)
+        
+        records.pop('inputs', None)
+        self.chapter_count = int(records.pop('chapter_count', 0))
+        self.workflow_results.update(records)
+        if 'outline' in records:
+            self.outline = BookOutline.model_validate_json(records['outline'])
+        for chapter_num in range(1, self.chapter_count + 1):
+            if f'chapter_{chapter_num}_state' in records:
+                self._merge_book_state(chapter_num, records[f'chapter_{chapter_num}_state'])
+        
+        # Later phases read earlier results through task context, so restore task outputs too
+        phase_tasks = {
+            'research': self.research_task(),
+            'design': self.design_task(),
+            'conclusion': self.conclusion_task(),
+            'final_control': self.final_control_task(),
+            'evaluation': self.final_evaluation()
+        }
+        for phase, phase_task in phase_tasks.items():
+            if phase in self.workflow_results:
+                self._restore_task_output(phase_task, self.workflow_results[phase])
+        
+        if records:
+            print(f"♻️ Resuming from {checkpoint.path}: {len(records)} completed steps restored")
+    
+    def _start_assembly(self, output_path: str) -> None:
+        """Stream the book to output_path, starting with the sections restored from the checkpoint"""
+        self.assembler = BookAssembler(output_path)
+        if 'design' in self.workflow_results:
+            self.assembler.set_chapter_count(self.chapter_count)
+        for key, text in list(self.workflow_results.items()):
+            self.assembler.add(key, text)
+        print(f"📘 Writing the book to {self.assembler.path} as its sections are approved "
+              f"(index: {self.assembler.index_path.name})")
+    
+    def _chapter_context_blocks(self, chapter_num: int, draft: str = None) -> list:
+        """Shared context of the tasks of one chapter as (label, text) blocks, research before design.
+        
+        With an outline these are the research passages and the slice of the outline relevant to
+        the chapter, identical for every draft, edit and review of it. The book state comes last:
+        writers get the entries matching the chapter's outline entry, reviewers (given the draft)
+        the entries the draft mentions.
+        """
+        if self.outline is None:
+            # Without a structured outline there is nothing to select by, so writers get both documents whole
+            blocks = [] if draft is not None else [("Research report", self.workflow_results.get('research', '')),
+                                                   ("Book design", self.workflow_results.get('design', ''))]
+            query = draft or ''
+        else:
+            spec = self.outline.chapter(chapter_num)
+            blocks = [
+                (f"Research passages for Chapter {chapter_num}", self._research_passages(chapter_num)),
+                (f"Design brief for Chapter {chapter_num}", self.outline.chapter_brief(chapter_num))
+            ]
+            query = draft or f"{spec.title}\n{spec.description}"
+        if self.track_book_state:
+            blocks.append(("Book state", self.book_state.relevant(query)))
+        return blocks
+    
+    def _research_passages(self, chapter_num: int) -> str:
+        """Top research passages for a chapter's outline entry, indexing the research report on first use"""
+        with self._index_lock:
+            if chapter_num not in self._retrieved_passages:
+                started = time.perf_counter()
+                if self.research_index is None:
+                    self.research_index = ResearchIndex(self.workflow_results.get('research', ''))
+                spec = self.outline.chapter(chapter_num)
+                passages = self.research_index.search(f"{spec.title}\n{spec.description}", k=self.research_passages)
+                self._retrieved_passages[chapter_num] = '\n\n'.join(passages)
+                
+                with self._stats_lock:
+                    self.phase_timings['retrieval'] = self.phase_timings.get('retrieval', 0.0) + time.perf_counter() - started
+                print(f"🔎 Chapter {chapter_num}: {len(passages)} of {len(self.research_index.passages)} research passages "
+                      f"(~{estimate_tokens(self._retrieved_passages[chapter_num])} tokens)")
+            return self._retrieved_passages[chapter_num]
+    
+    def _context_task(self, label: str, text: str) -> Task:
+        """Wrap a text in an already-completed task so it can be passed as task context"""
+        context_task = Task(description=label, expected_output=label)
+        self._restore_task_output(context_task, text)
+        return context_task
+    
+    def _restore_task_output(self, task: Task, text: str) -> None:
+        """Give a task the output of an earlier run without executing it"""
+        task.output = TaskOutput(
+            description=task.description,
+            raw=text,
+            agent=task.agent.role if task.agent else ""
+        )
+    
+    # ==================== TOKEN BUDGETS ====================
+    
+    def _budget_for(self, agent: Agent) -> TokenBudget:
+        """Token budget of an agent's prompts: the num_ctx of its LLM minus its reserve_tokens in agents.yaml"""
+        role = agent.role.strip()
+        config = next((c for c in self.agents_config.values() if str(c.get('role', '')).strip() == role), {})
+        num_ctx = getattr(agent.llm, 'additional_params', {}).get('num_ctx', 2048)  # 2048: the Ollama default
+        return TokenBudget(agent.llm.model, num_ctx, config.get('reserve_tokens', self.DEFAULT_RESERVE_TOKENS))
+    
+    def _fixed_prompt_tokens(self, agent: Agent, task: Task, budget: TokenBudget) -> int:
+        """Tokens of a task's prompt apart from its context: the agent's persona, the task and crewai's instructions"""
+        fixed = (agent.role, agent.goal, agent.backstory, task.description, task.expected_output)
+        return sum(budget.count(text) for text in fixed if text) + self.PROMPT_OVERHEAD_TOKENS
+    
+    def _fit_context_blocks(self, agent: Agent, blocks: list, *fixed_texts: str) -> list:
+        """Trim (label, text) context blocks to what the agent's context window leaves after the rest of the prompt"""
+        if not blocks:
+            return []
+        budget = self._budget_for(agent)
+        # The block headers of the layout take their share too
+        layout = layout_description([(label, '-') for label, _ in blocks], '')
+        available = budget.available(agent.role, agent.goal, agent.backstory, layout, *fixed_texts) - self.PROMPT_OVERHEAD_TOKENS
+        fitted, trimmed = budget.fit_blocks(blocks, available)
+        if trimmed:
+            print(f"✂️ Trimmed {', '.join(trimmed)} to fit the context window of the {agent.role.strip()}")
+            self._bump_metric('context_trims')
+        return fitted
+    
+    def _check_budget(self, agent: Agent, task: Task) -> dict:
+        """Count a task's prompt against the agent's budget before kickoff; raises ContextOverflowError if it cannot fit"""
+        budget = self._budget_for(agent)
+        context = task.context if isinstance(task.context, list) else []
+        prompt_tokens = self._fixed_prompt_tokens(agent, task, budget) + sum(
+            budget.count(context_task.output.raw) for context_task in context if context_task.output
         )
+        usage = {'agent': agent.role.strip(), 'prompt_tokens': prompt_tokens, 'budget_tokens': budget.limit,
+                 'share': prompt_tokens / max(budget.limit, 1)}
+        with self._stats_lock:
+            self.budget_usage.append(usage)
         
-        result = eval_crew.kickoff(inputs=inputs)
-        self.workflow_results['evaluation'] = result
-        return result
+        if prompt_tokens > budget.limit:
+            self._bump_metric('calls_refused_over_budget')
+            raise ContextOverflowError(
+                f"The {usage['agent']} prompt for '{self._task_label(task)}' needs {prompt_tokens} tokens, but "
+                f"{budget.model} leaves {budget.limit} (num_ctx {budget.num_ctx} minus {budget.reserve_tokens} "
+                f"reserved for the answer)"
+            )
+        return {'prompt_tokens_counted': prompt_tokens, 'budget_tokens': budget.limit}
+    
+    @staticmethod
+    def _task_label(task: Task) -> str:
+        """First line of a task's own text, after any shared context blocks"""
+        text = task.description.split("=== YOUR TASK ===")[-1]
+        return next((line.strip() for line in text.splitlines() if line.strip()), "task")[:80]
+    
+    def _report_budgets(self) -> None:
+        """Print the peak share of its context window each agent's prompts used"""
+        peaks = {}
+        for usage in self.budget_usage:
+            agent = peaks.setdefault(usage['agent'], {'calls': 0, 'peak': usage})
+            agent['calls'] += 1
+            if usage['share'] > agent['peak']['share']:
+                agent['peak'] = usage
+        for name, agent in peaks.items():
+            peak = agent['peak']
+            print(f"🧮 {name}: {agent['calls']} prompts, largest {peak['prompt_tokens']}/{peak['budget_tokens']} tokens "
+                  f"({peak['share']:.0%} of its budget)")
     
     # ==================== UTILITY METHODS ====================
     
-    def _extract_chapter_count(self, design_output: str) -> int:
-        """Extract number of chapters from design output"""
+    def _bump_metric(self, name: str, amount: int = 1) -> None:
+        """Increase a workflow counter (safe to call from worker threads)"""
+        with self._stats_lock:
+            self.metrics[name] = self.metrics.get(name, 0) + amount
+    
+    def _next_unwritten_chapter(self, chapter_num: int, approved: dict):
+        """Return the first chapter after chapter_num that is not approved yet, or None"""
+        for next_chapter in range(chapter_num + 1, self.chapter_count + 1):
+            if next_chapter not in approved:
+                return next_chapter
+        return None
+    
+    def _task_uses_cache(self, task_name: str) -> bool:
+        """Tasks with `cache: false` in tasks.yaml always go to the model"""
+        return self.tasks_config.get(task_name, {}).get('cache', True)
+    
+    def _report_metrics(self) -> None:
+        """Print the workflow counters collected during the run"""
+        if self.metrics:
+            print("📊 Workflow metrics: " + ", ".join(f"{name}={value}" for name, value in sorted(self.metrics.items())))
+    
+    def _report_profile(self) -> None:
+        """Print LLM calls, tokens and queue wait per phase when profiling is enabled"""
+        if not self.profiler.enabled:
+            return
+        print("⏱️ Profile by phase (tokens are estimates):")
+        for phase, totals in self.profiler.summary().items():
+            print(f"   {phase}: {totals['llm_calls']} LLM calls ({totals['cache_hits']} cached), "
+                  f"{totals['prompt_tokens']} prompt / {totals['completion_tokens']} completion tokens, "
+                  f"{totals['llm_seconds']:.1f}s in LLM calls ({totals['prefill_seconds']:.1f}s prefill), "
+                  f"{totals['queue_wait']:.1f}s waiting for a slot")
+    
+    def _report_prefill(self) -> None:
+        """Print the prompt prefill and model load time reported by Ollama for each model"""
+        totals = {}
+        for llm in list(self._llms.values()):
+            model = totals.setdefault(llm.model, {'calls': 0, 'prefill_seconds': 0.0, 'load_seconds': 0.0})
+            for name, value in llm.timing_totals.items():
+                model[name] += value
+        for name, model in totals.items():
+            if model['calls']:
+                print(f"⚡ Prefill {name}: {model['prefill_seconds']:.1f}s over {model['calls']} calls "
+                      f"({model['prefill_seconds'] / model['calls']:.2f}s per call), {model['load_seconds']:.1f}s loading the model")
+    
+    def _report_cache_stats(self) -> None:
+        """Print the hit/miss counters of the LLM response cache and of the search tool, and the calls per endpoint"""
+        search = self.search_tool.stats()
+        print(f"🌐 Web search: {search['requests']} requests, {search['cache_hits']} cache hits, "
+              f"{search['deduplicated']} deduplicated, {search['errors']} errors")
+        
+        if len(self.endpoint_pool.endpoints) > 1:
+            for url, endpoint in self.endpoint_pool.stats().items():
+                print(f"🖥️ Ollama {url}: {endpoint['requests']} calls, {endpoint['failures']} failures")
+        
+        if not self.response_cache:
+            return
+        stats = self.response_cache.stats()
+        print(f"💾 LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries, {stats['size_bytes'] / 1024 / 1024:.1f} MB)")
+    
+    def _extract_chapter_count(self, design_output: str, book_length: str = 'medium') -> int:
+        """Extract number of chapters from a free-form design, clamped to the range of the book length"""
+        min_chapters, max_chapters = self.CHAPTER_RANGES.get(book_length, self.CHAPTER_RANGES['medium'])
+        
         # Look for patterns like "Chapter 1:", "Chapter 2:", etc.
         chapter_matches = re.findall(r'Chapter\s+(\d+):', design_output, re.IGNORECASE)
         
-        if not chapter_matches:
-            # Fallback: look for numbered sections
-            chapter_matches = re.findall(r'(\d+)\.', design_output)
-        
-        if not chapter_matches:
+        if chapter_matches:
+            count = len(set(chapter_matches))
+        else:
             # Look for explicit statements about chapter count
             count_matches = re.findall(r'(\d+)\s+chapters?', design_output, re.IGNORECASE)
-            if count_matches:
-                return int(count_matches[-1])
-            
-            # Default fallback
-            print("⚠️ Could not extract chapter count from design. Using default: 5")
-            return 5
-        else:
-            return len(set(chapter_matches))
+            if not count_matches:
+                count = (min_chapters + max_chapters) // 2
+                print(f"⚠️ Could not extract chapter count from design. Using default: {count}")
+                return count
+            count = int(count_matches[-1])
+        
+        if not min_chapters <= count <= max_chapters:
+            print(f"⚠️ Design suggests {count} chapters, outside the {min_chapters}-{max_chapters} range of a {book_length} book")
+        return min(max(count, min_chapters), max_chapters)
     
     def _parse_review_decision(self, review_content: str) -> str:
-        """Extract the review decision from controller's feedback"""
+        """Guess the review decision from keywords, used when a review is not a valid verdict"""
         # Look for decision keywords
         content_upper = review_content.upper()
         
@@ -534,70 +2065,28 @@ class PublishingHouseCrew():
             # Default to minor revisions if unclear
             return "MINOR_REVISIONS"
     
-    def _extract_revision_notes(self, review_content: str) -> str:
-        """Extract specific revision notes from controller's feedback"""
-        # Look for sections with recommendations or specific issues
-        lines = review_content.split('\n')
-        revision_notes = []
-        
-        collecting_notes = False
-        for line in lines:
-            line = line.strip()
-            
-            # Start collecting after keywords
-            if any(keyword in line.upper() for keyword in ['SPECIFIC ISSUES', 'RECOMMENDATIONS', 'REQUIRED CHANGES', 'CORRECTIONS']):
-                collecting_notes = True
-                continue
-            
-            # Stop collecting at next major section
-            if collecting_notes and line.upper().startswith(('OVERALL', 'DECISION', 'SUMMARY')):
+    def _extract_revision_notes(self, verdict: ReviewVerdict) -> str:
+        """Turn a review verdict into revision notes for the writer, most important issues first"""
+        return verdict.revision_notes()
+    
+    def _chapter_ending(self, chapter_content: str, max_chars: int = 1500) -> str:
+        """Return the closing paragraphs of a chapter, used to write the transition into the next one"""
+        paragraphs = [p.strip() for p in chapter_content.strip().split('\n\n') if p.strip()]
+        ending = []
+        length = 0
+        for paragraph in reversed(paragraphs):
+            if ending and length + len(paragraph) > max_chars:
                 break
-            
-            # Collect meaningful lines
-            if collecting_notes and line and not line.startswith('='):
-                revision_notes.append(line)
-        
-        if revision_notes:
-            return '\n'.join(revision_notes)
-        else:
-            # Fallback: return the whole review
-            return review_content
+            ending.insert(0, paragraph)
+            length += len(paragraph)
+        return '\n\n'.join(ending)[-max_chars:]
     
     def _compile_final_book(self) -> str:
-        """Compile all parts into a complete book"""
-        book_content = f"""# COMPLETE BOOK
-
-## RESEARCH REPORT
-{self.workflow_results.get('research', 'No research available')}
-
-## BOOK DESIGN
-{self.workflow_results.get('design', 'No design available')}
-
-## BOOK CONTENT
-"""
-        
-        # Add all chapters
-        for i in range(1, self.chapter_count + 1):
-            chapter_content = self.workflow_results.get(f'chapter_{i}', f'Chapter {i} not available')
-            book_content += f"\n### Chapter {i}\n{chapter_content}\n"
-        
-        # Add conclusion
-        book_content += f"\n### Conclusion\n{self.workflow_results.get('conclusion', 'No conclusion available')}\n"
-        
-        # Add revision history summary
-        book_content += f"\n## REVISION HISTORY\n"
-        revision_summary = self._generate_revision_summary()
-        book_content += revision_summary
-        
-        book_content += f"""
-## FINAL QUALITY CONTROL REPORT
-{self.workflow_results.get('final_control', 'No final control report available')}
-
-## DIRECTOR'S FINAL EVALUATION
-{self.workflow_results.get('evaluation', 'No evaluation available')}
-"""
-        
-        return book_content
+        """Compile all parts into a complete book in memory (the streamed book file has the same sections)"""
+        sections = {**self.workflow_results, 'revision_history': self._generate_revision_summary()}
+        return "# COMPLETE BOOK\n" + ''.join(
+            render_section(key, sections.get(key, placeholder(key))) for key in section_keys(self.chapter_count)
+        )
     
     def _generate_revision_summary(self) -> str:
         """Generate a summary of the revision process"""
@@ -0,0 +1,125 @@
+"""
+Paragraph-level comparison and patching of chapter drafts.
+"""
+
+import difflib
+import re
+
+
+def split_paragraphs(text: str) -> list:
+    """Split a chapter into non-empty paragraphs (headings count as paragraphs)"""
+    return [p.strip() for p in text.strip().split('\n\n') if p.strip()]
+
+
+def _preview(text: str, max_chars: int = 300) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + "..."
+
+
+def diff_drafts(old_draft: str, new_draft: str) -> dict:
+    """Compare two drafts paragraph by paragraph.
+
+    Returns a dict with:
+    - changed_ratio: share of the new draft (in characters) that was inserted or rewritten,
+      plus the share of the old draft that was deleted
+    - summary: one line per change, locating it by paragraph number in the new draft
+    - changed_passages: full text of every inserted or rewritten paragraph of the new draft
+    """
+    old_paragraphs = split_paragraphs(old_draft)
+    new_paragraphs = split_paragraphs(new_draft)
+    matcher = difflib.SequenceMatcher(a=old_paragraphs, b=new_paragraphs, autojunk=False)
+
+    summary = []
+    passages = []
+    changed_chars = 0
+
+    for op, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if op == 'equal':
+            continue
+
+        location = f"P{new_start + 1}" if new_end - new_start <= 1 else f"P{new_start + 1}-P{new_end}"
+        if op == 'delete':
+            removed = '\n\n'.join(old_paragraphs[old_start:old_end])
+            changed_chars += len(removed)
+            summary.append(f"- DELETED before P{new_start + 1}: \"{_preview(removed)}\"")
+            continue
+
+        added = new_paragraphs[new_start:new_end]
+        changed_chars += sum(len(p) for p in added)
+        if op == 'insert':
+            summary.append(f"- INSERTED {location}")
+        else:
+            replaced = '\n\n'.join(old_paragraphs[old_start:old_end])
+            summary.append(f"- REWRITTEN {location} (was: \"{_preview(replaced)}\")")
+
+        for offset, paragraph in enumerate(added):
+            passages.append(f"[P{new_start + offset + 1}]\n{paragraph}")
+
+    total_chars = max(len('\n\n'.join(new_paragraphs)), 1)
+    return {
+        'changed_ratio': changed_chars / total_chars,
+        'summary': '\n'.join(summary) or "- No changes",
+        'changed_passages': '\n\n'.join(passages)
+    }
+
+
+class PatchError(ValueError):
+    """Raised when a set of paragraph edits cannot be applied to a draft"""
+
+
+EDIT_PATTERN = re.compile(r'<<<(REPLACE|INSERT_AFTER|DELETE) P(\d+)>>>\s*(.*?)\s*<<<END>>>', re.DOTALL)
+ANCHOR_PREFIX = re.compile(r'^\[P\d+\]\s*')
+
+
+def number_paragraphs(text: str) -> str:
+    """Prefix every paragraph with its [Pn] anchor"""
+    return '\n\n'.join(f"[P{i}] {p}" for i, p in enumerate(split_paragraphs(text), start=1))
+
+
+def parse_edits(text: str) -> list:
+    """Extract <<<OP Pn>>> ... <<<END>>> edit blocks from a writer response"""
+    return [
+        {'op': op, 'anchor': int(anchor), 'text': ANCHOR_PREFIX.sub('', body.strip())}
+        for op, anchor, body in EDIT_PATTERN.findall(text)
+    ]
+
+
+def apply_edits(draft: str, edits: list) -> str:
+    """Apply paragraph edits to a draft, validating that every anchor resolves.
+
+    Anchors always refer to the paragraph numbering of the original draft, so edits
+    do not shift each other. Raises PatchError if there is nothing to apply, an anchor
+    is out of range, a paragraph is replaced or deleted twice, or a replacement is empty.
+    """
+    if not edits:
+        raise PatchError("no edits found")
+
+    paragraphs = split_paragraphs(draft)
+    replaced = {}
+    inserted = {}
+
+    for edit in edits:
+        anchor = edit['anchor']
+        if not 1 <= anchor <= len(paragraphs):
+            raise PatchError(f"anchor P{anchor} does not exist (draft has {len(paragraphs)} paragraphs)")
+
+        if edit['op'] == 'INSERT_AFTER':
+            if not edit['text']:
+                raise PatchError(f"empty insertion after P{anchor}")
+            inserted.setdefault(anchor, []).append(edit['text'])
+            continue
+
+        if anchor in replaced:
+            raise PatchError(f"P{anchor} is edited more than once")
+        if edit['op'] == 'REPLACE' and not edit['text']:
+            raise PatchError(f"empty replacement for P{anchor}")
+        replaced[anchor] = edit['text'] if edit['op'] == 'REPLACE' else None
+
+    result = []
+    for i, paragraph in enumerate(paragraphs, start=1):
+        new_text = replaced.get(i, paragraph)
+        if new_text:
+            result.append(new_text)
+        result.extend(inserted.get(i, []))
+
+    return '\n\n'.join(result)
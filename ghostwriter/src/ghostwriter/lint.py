@@ -0,0 +1,93 @@
+"""
+Deterministic checks run on a chapter draft before it goes to the controller.
+"""
+
+import re
+
+from .drafts import split_paragraphs
+from .schemas import ReviewIssue
+
+DEFAULT_WORD_RANGE = (1500, 3000)
+REASONING_TAG = re.compile(r'</?think>', re.IGNORECASE)
+HEADING = re.compile(r'^#{1,6}\s+\S', re.MULTILINE)
+# Characters a finished chapter can end with (sentence ends, closing quotes and brackets, emphasis)
+CLOSING_CHARS = '.!?…"\'”’)]*_'
+# Lines that legitimately end without punctuation: list items, code fences, table rows, rules and bare URLs
+NON_PROSE_LINE = re.compile(r'^(?:[-*+]\s|\d+[.)]\s|```|~~~|\||(?:-{3,}|\*{3,}|_{3,})$|<?https?://\S+>?$)')
+MIN_REPEATED_CHARS = 80
+
+
+def _normalize(paragraph: str) -> str:
+    return ' '.join(paragraph.lower().split())
+
+
+def lint_chapter(chapter_content: str, target_words: int = None) -> list:
+    """Check a chapter draft for defects that do not need a model to spot.
+
+    Returns a list of ReviewIssue. HIGH priority issues make the draft unfit for review;
+    the others are passed on to the controller.
+    """
+    issues = []
+    text = chapter_content.strip()
+
+    if REASONING_TAG.search(text):
+        issues.append(ReviewIssue(
+            priority='HIGH', category='structure', location='whole chapter',
+            problem='The chapter contains <think> reasoning tags from the model',
+            suggestion='Return only the chapter text, without any reasoning'
+        ))
+
+    words = len(text.split())
+    min_words, max_words = (target_words, target_words) if target_words else DEFAULT_WORD_RANGE
+    if words < min_words / 2:
+        issues.append(ReviewIssue(
+            priority='HIGH', category='structure', location='whole chapter',
+            problem=f'The chapter has {words} words, far below the target of {min_words}',
+            suggestion=f'Write the complete chapter with about {target_words or min_words} words'
+        ))
+    elif words > max_words * 2:
+        issues.append(ReviewIssue(
+            priority='MEDIUM', category='structure', location='whole chapter',
+            problem=f'The chapter has {words} words, far above the target of {max_words}',
+            suggestion='Tighten the chapter and remove digressions'
+        ))
+
+    if text and not HEADING.search(text):
+        issues.append(ReviewIssue(
+            priority='MEDIUM', category='structure', location='beginning',
+            problem='The chapter has no Markdown headings',
+            suggestion='Start with the chapter title as a heading and mark the main sections'
+        ))
+
+    paragraphs = split_paragraphs(text)
+    last_line = paragraphs[-1].splitlines()[-1].strip() if paragraphs else ''
+    if (last_line and not HEADING.match(last_line) and not NON_PROSE_LINE.match(last_line)
+            and last_line[-1] not in CLOSING_CHARS):
+        issues.append(ReviewIssue(
+            priority='HIGH', category='structure', location='end of the chapter',
+            problem=f'The chapter stops mid-sentence ("...{last_line[-60:]}")',
+            suggestion='Finish the last section and close the chapter properly'
+        ))
+
+    seen = {}
+    for number, paragraph in enumerate(paragraphs, start=1):
+        if len(paragraph) < MIN_REPEATED_CHARS:
+            continue
+        key = _normalize(paragraph)
+        if key in seen:
+            issues.append(ReviewIssue(
+                priority='HIGH', category='content', location=f'paragraph {number}',
+                problem=f'Paragraph {number} repeats paragraph {seen[key]} word for word',
+                suggestion='Remove the repetition or replace it with new material'
+            ))
+        else:
+            seen[key] = number
+
+    return issues
+
+
+def lint_report(issues: list) -> str:
+    """Format linter findings for a prompt"""
+    if not issues:
+        return "All automatic checks passed (length, headings, ending, repetition, reasoning tags)."
+    return '\n'.join(issue.render() for issue in issues)
@@ -0,0 +1,178 @@
+"""
+LLM wrapper used by every agent of the publishing house.
+"""
+
+import copy
+import threading
+
+import litellm
+from crewai import LLM
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+from .cache import ResponseCache
+from .context import estimate_tokens
+from .profiling import NULL_PROFILER, Profiler
+from .routing import EndpointPool
+
+# Errors that mean the endpoint, not the request, is the problem: the call is retried elsewhere
+ENDPOINT_ERRORS = (
+    litellm.exceptions.APIConnectionError,
+    litellm.exceptions.ServiceUnavailableError,
+    litellm.exceptions.InternalServerError
+)
+
+# Timings Ollama reported for the last call of each thread, in seconds
+_server_timings = threading.local()
+OLLAMA_TIMINGS = {'load_duration': 'load_seconds', 'prompt_eval_duration': 'prefill_seconds',
+                  'eval_duration': 'generation_seconds'}
+
+
+class TimingHTTPHandler(HTTPHandler):
+    """HTTP client of a CachedLLM's Ollama calls, keeping the timings Ollama reports, which litellm drops"""
+
+    def post(self, *args, stream: bool = False, **kwargs):
+        response = super().post(*args, stream=stream, **kwargs)
+        if stream:
+            return response
+        try:
+            body = response.json()
+        except ValueError:
+            return response
+        if isinstance(body, dict):
+            _server_timings.last = {
+                name: body[field] / 1e9 for field, name in OLLAMA_TIMINGS.items() if isinstance(body.get(field), (int, float))
+            }
+        return response
+
+
+class CachedLLM(LLM):
+    """crewai LLM that answers repeated requests from a persistent ResponseCache.
+
+    With an endpoint pool, every call goes to the least loaded healthy endpoint of the
+    pool and is retried on another one if the endpoint fails. keep_alive is sent with
+    every call, so Ollama keeps the model and its prompt cache loaded between calls.
+    """
+
+    # Parameters that change the model output and therefore belong in the cache key
+    SAMPLING_PARAMS = (
+        'temperature', 'top_p', 'n', 'stop', 'max_tokens', 'max_completion_tokens',
+        'presence_penalty', 'frequency_penalty', 'logit_bias', 'seed', 'reasoning_effort'
+    )
+
+    def __init__(self, *args, response_cache: ResponseCache = None, profiler: Profiler = None,
+                 endpoint_pool: EndpointPool = None, keep_alive: str = None, **kwargs) -> None:
+        if keep_alive is not None:
+            # Ollama reads keep_alive next to the options, where litellm would put it as a plain parameter
+            kwargs['extra_body'] = {**(kwargs.get('extra_body') or {}), 'keep_alive': keep_alive}
+        super().__init__(*args, **kwargs)
+        self.response_cache = response_cache
+        self.profiler = profiler or NULL_PROFILER
+        self.endpoint_pool = endpoint_pool
+        self.keep_alive = keep_alive
+        # Only the calls of this LLM go through it, so the rest of litellm is left as it is
+        self.http_client = TimingHTTPHandler() if self.model.startswith('ollama/') else None
+        self._routed = {}  # Copy of this LLM per endpoint URL; calls never change the base_url of a shared LLM
+        self._routed_lock = threading.Lock()
+        # Server timings of the calls of this LLM and of its routed copies
+        self.timing_totals = {'calls': 0, 'prefill_seconds': 0.0, 'load_seconds': 0.0}
+        self._timing_lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        with self.profiler.span("llm call", "llm", model=self.model) as span:
+            _server_timings.last = None
+            response, span['cache_hit'] = self._call(messages, tools, callbacks, available_functions, **kwargs)
+            timings = _server_timings.last
+            if timings:
+                self._record_timings(timings)
+            if self.profiler.enabled:
+                # Local estimates: the crewai LLM does not expose the usage reported by the server
+                span['prompt_tokens'] = sum(estimate_tokens(str(m.get('content') or '')) for m in self._as_messages(messages))
+                span['completion_tokens'] = estimate_tokens(response) if isinstance(response, str) else 0
+                span['tokens_estimated'] = True
+                span.update(timings or {})
+            return response
+
+    def _prepare_completion_params(self, messages, tools=None) -> dict:
+        params = super()._prepare_completion_params(messages, tools)
+        if self.http_client is not None:
+            params['client'] = self.http_client
+        return params
+
+    def reset_timings(self) -> None:
+        with self._timing_lock:
+            self.timing_totals.update(calls=0, prefill_seconds=0.0, load_seconds=0.0)
+
+    def _record_timings(self, timings: dict) -> None:
+        with self._timing_lock:
+            self.timing_totals['calls'] += 1
+            self.timing_totals['prefill_seconds'] += timings.get('prefill_seconds', 0.0)
+            self.timing_totals['load_seconds'] += timings.get('load_seconds', 0.0)
+
+    def _call(self, messages, tools, callbacks, available_functions, **kwargs) -> tuple:
+        """Answer from the cache or the model; returns the response and whether it was a cache hit"""
+        cache = self.response_cache
+        # Tool-calling responses can trigger side effects, so they always go to the model
+        if cache is None or not cache.enabled or tools or available_functions:
+            return self._complete(messages, tools, callbacks, available_functions, **kwargs), False
+
+        key = self.cache_key(messages)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+
+        response = self._complete(messages, tools, callbacks, available_functions, **kwargs)
+        if isinstance(response, str) and response:
+            cache.put(key, response)
+        return response, False
+
+    def _complete(self, messages, tools, callbacks, available_functions, **kwargs):
+        """Send a call to the model, through the endpoint pool when there is one"""
+        if self.endpoint_pool is None:
+            return super().call(messages, tools=tools, callbacks=callbacks,
+                                available_functions=available_functions, **kwargs)
+
+        tried = []
+        while True:
+            with self.endpoint_pool.acquire(exclude=tuple(tried)) as endpoint:
+                try:
+                    return LLM.call(self._routed_llm(endpoint.url), messages, tools=tools, callbacks=callbacks,
+                                    available_functions=available_functions, **kwargs)
+                except ENDPOINT_ERRORS as e:
+                    self.endpoint_pool.eject(endpoint, e)
+                    tried.append(endpoint)
+                    if len(tried) >= len(self.endpoint_pool.endpoints):
+                        raise
+
+    def _routed_llm(self, url: str) -> LLM:
+        """This LLM pointed at another endpoint"""
+        if url == self.base_url:
+            return self
+        with self._routed_lock:
+            routed = self._routed.get(url)
+            if routed is None:
+                routed = self._routed[url] = copy.copy(self)
+                routed.base_url = url
+                routed.api_base = None
+            return routed
+
+    @staticmethod
+    def _as_messages(messages) -> list:
+        if isinstance(messages, str):
+            return [{"role": "user", "content": messages}]
+        return messages
+
+    def cache_key(self, messages) -> str:
+        """Fingerprint of the model, the messages and the sampling parameters of a call"""
+        messages = self._as_messages(messages)
+
+        sampling = {name: getattr(self, name, None) for name in self.SAMPLING_PARAMS}
+        extra = dict(getattr(self, 'additional_params', {}))
+        if self.keep_alive is not None:
+            # keep_alive only decides how long the model stays loaded
+            extra['extra_body'] = {name: value for name, value in extra['extra_body'].items() if name != 'keep_alive'}
+        return ResponseCache.make_key(
+            model=self.model,
+            messages=messages,
+            sampling=sampling,
+            extra=extra
+        )
@@ -4,27 +4,31 @@ Publishing House MAS - Entry Point
 Multi-Agent System for automated book creation
 """
 
+import argparse
 import os
 import sys
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .checkpoint import CheckpointStore
+from .profiling import Profiler
+from .routing import EndpointPool, ollama_urls_from_env
+
 load_dotenv()
 
 
-def check_requirements():
+def check_requirements(ollama_urls: list = None):
     """Check if all required components are available"""
     issues = []
     
-    # Check Ollama connection
-    try:
-        import requests
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code != 200:
-            issues.append("❌ Ollama server not responding")
-    except Exception:
-        issues.append("❌ Cannot connect to Ollama server")
+    # Check every Ollama endpoint; the run can go on as long as one of them answers
+    health = EndpointPool(ollama_urls).check()
+    if not any(health.values()):
+        issues.append("❌ Cannot connect to Ollama server" + (f"s: {', '.join(health)}" if len(health) > 1 else ""))
+    else:
+        issues.extend(f"⚠️ Ollama server {url} not responding - it is retried later" for url, ok in health.items() if not ok)
+        issues.extend(check_models([url for url, ok in health.items() if ok]))
     
     # Check environment variables
     if not os.getenv('SERPER_API_KEY'):
@@ -39,6 +43,51 @@ def check_requirements():
     
     return issues
 
+def check_models(ollama_urls: list) -> list:
+    """Check that every model configured in agents.yaml has been pulled on the Ollama servers.
+    
+    A model missing on some servers is a warning for each of them; a required model no
+    server has is a critical issue.
+    """
+    import requests
+    from .models import agent_llm_settings, load_agents_config
+    
+    agents = load_agents_config()
+    if not agents:
+        return []
+    settings = agent_llm_settings(agents)
+    # First-pass models are only used with --review-cascade
+    first_pass = agent_llm_settings(agents, 'first_pass_llm_settings')
+    required = {entry['model'] for entry in settings}
+    models = sorted(required | {entry['model'] for entry in first_pass})
+    
+    issues = []
+    # Ollama reloads a model, and drops its prompt cache, whenever it is called with another context size
+    for model in models:
+        sizes = sorted({entry['num_ctx'] for entry in settings + first_pass if entry['model'] == model})
+        if len(sizes) > 1:
+            issues.append(f"⚠️ Model {model} is configured with num_ctx {' and '.join(map(str, sizes))} "
+                          f"- Ollama reloads it whenever the context size changes")
+    
+    pulled = {}
+    for url in ollama_urls:
+        try:
+            response = requests.get(f"{url}/api/tags", timeout=5)
+            pulled[url] = {model['name'] for model in response.json().get('models', [])}
+        except (requests.RequestException, ValueError):
+            continue
+    for model in models:
+        name = model.split('/', 1)[-1]
+        missing = [url for url, available in pulled.items() if name not in available and f"{name}:latest" not in available]
+        if missing and len(missing) == len(pulled):
+            severity = "❌" if model in required else "⚠️"
+            where = "any Ollama server" if len(pulled) > 1 else missing[0]
+            issues.append(f"{severity} Model {name} not found on {where} - run: ollama pull {name}")
+        else:
+            issues.extend(f"⚠️ Model {name} not found on {url} - calls routed there fail until you run: "
+                          f"ollama pull {name}" for url in missing)
+    return issues
+
 def get_user_inputs():
     """Get user inputs with validation"""
     print("📚 Book Creation Configuration")
@@ -72,24 +121,91 @@ def get_user_inputs():
         'book_length': book_length
     }
 
-def save_book(content: str, topic: str) -> str:
-    """Save the book to a file with timestamp"""
+def book_basename(topic: str) -> str:
+    """Build a filesystem-safe, timestamped base name for files about a book"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     safe_topic = "".join(c for c in topic if c.isalnum() or c in (' ', '-', '_')).rstrip()
     safe_topic = safe_topic.replace(' ', '_').lower()
     
-    output_file = f"book_{safe_topic}_{timestamp}.md"
-    
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        return output_file
-    except Exception as e:
-        print(f"❌ Error saving book: {str(e)}")
-        return None
+    return f"book_{safe_topic}_{timestamp}"
+
+def book_path(topic: str, output_dir: str = ".", basename: str = None) -> str:
+    """Path of the book file, which the crew writes section by section as the book is created"""
+    return str(Path(output_dir) / f"{basename or book_basename(topic)}.md")
 
-def main():
+def parse_args(argv=None, replay=False, batch=False, serve=False):
+    """Parse command line options for the publishing house system"""
+    parser = argparse.ArgumentParser(description="Multi-Agent System for automated book creation")
+    if replay:
+        parser.add_argument("checkpoint", nargs="?",
+                            help="checkpoint file to resume (default: the most recent one in --checkpoint-dir)")
+    if batch:
+        parser.add_argument("jobs", help="JSON lines or CSV file of jobs with topic, target_audience and book_length")
+        parser.add_argument("--max-books", type=int, default=2,
+                            help="books written at the same time; they share the --max-llm-calls limit (default: 2)")
+    if serve:
+        parser.add_argument("--host", default="127.0.0.1", help="address the job API listens on (default: 127.0.0.1)")
+        parser.add_argument("--port", type=int, default=8080, help="port of the job API (default: 8080)")
+        parser.add_argument("--workers", type=int, default=2,
+                            help="books written at the same time, each by a reused crew; they share the "
+                                 "--max-llm-calls limit (default: 2)")
+    if batch or serve:
+        parser.add_argument("--output-dir", default="books",
+                            help="directory of the finished books (default: books)")
+    parser.add_argument("--writing-mode", choices=["sequential", "parallel", "pipelined"], default="sequential",
+                        help="how chapters are written and reviewed (default: sequential)")
+    parser.add_argument("--research-mode", choices=["single", "fanout"], default="single",
+                        help="research the topic in one task, or each facet concurrently and merge (default: single)")
+    parser.add_argument("--final-control", choices=["single", "mapreduce"], default="single",
+                        help="final quality control in one call on the chapter digests, or a concurrent check per "
+                             "chapter followed by a cross-chapter consistency check (default: single)")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="chapters written or checked, or research facets searched, at the same time (default: 4)")
+    parser.add_argument("--max-llm-calls", type=int, default=2,
+                        help="maximum LLM calls in flight at once (default: 2)")
+    parser.add_argument("--ollama-url", dest="ollama_urls", action="append",
+                        help="Ollama endpoint; repeat to spread calls over several servers "
+                             "(default: $OLLAMA_URLS, comma-separated, or http://localhost:11434)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always call the model instead of reusing cached responses")
+    parser.add_argument("--cache-dir", default=".ghostwriter_cache",
+                        help="directory of the persistent LLM response cache (default: .ghostwriter_cache)")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="size limit of the response cache before old entries are evicted (default: 512)")
+    parser.add_argument("--search-cache-ttl-hours", type=float, default=168,
+                        help="how long web search results are reused, also across books (default: 168, 0 disables)")
+    parser.add_argument("--context-budget", type=int, default=6000,
+                        help="token budget of the book context given to the conclusion, final control and evaluation (default: 6000)")
+    parser.add_argument("--incremental-review-max-change", type=float, default=0.35,
+                        help="re-review only the changed passages of a revision unless more than this share "
+                             "of the chapter changed (default: 0.35, 0 always reviews in full)")
+    parser.add_argument("--full-rewrites", action="store_true",
+                        help="rewrite the whole chapter on minor revisions instead of applying paragraph edits")
+    parser.add_argument("--revision-policy", choices=["convergence", "fixed"], default="convergence",
+                        help="when to stop revising a chapter: once drafts stop improving, or after a fixed number "
+                             "of cycles (default: convergence)")
+    parser.add_argument("--review-cascade", action="store_true",
+                        help="review chapters with the controller's first-pass model (agents.yaml) and escalate "
+                             "to its main model only when the verdict is uncertain")
+    parser.add_argument("--no-book-state", action="store_true",
+                        help="do not record the entities, terms, claims and open threads of approved chapters "
+                             "for the writer and controller of later chapters")
+    parser.add_argument("--research-passages", type=int, default=6,
+                        help="research passages given to each chapter, picked by relevance to its outline entry (default: 6)")
+    parser.add_argument("--profile", action="store_true",
+                        help="record spans of phases, chapters and LLM calls and export them to --profile-dir")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="directory of the JSON lines and Chrome trace profiles (default: profiles)")
+    parser.add_argument("--checkpoint-dir", default="checkpoints",
+                        help="directory where workflow progress is saved for replay (default: checkpoints)")
+    args = parser.parse_args(argv)
+    args.ollama_urls = args.ollama_urls or ollama_urls_from_env()
+    return args
+
+def main(argv=None):
     """Main function to start the publishing house system"""
+    args = parse_args(argv)
+    
     print("🏢 Publishing House MAS")
     print("=" * 50)
     print("Multi-Agent System for Automated Book Creation")
@@ -97,7 +213,7 @@ def main():
     
     # Check system requirements
     print("🔍 Checking system requirements...")
-    issues = check_requirements()
+    issues = check_requirements(args.ollama_urls)
     
     if issues:
         print("\n⚠️ System Issues Found:")
@@ -121,36 +237,70 @@ def main():
         print("\n👋 Operation cancelled by user")
         return 0
     
+    checkpoint = CheckpointStore(Path(args.checkpoint_dir) / f"{book_basename(inputs['topic'])}.jsonl")
+    
     # Display configuration
     print(f"\n🚀 Starting book creation...")
+    return create_book(inputs, args, checkpoint)
+
+def build_crew(args, profiler: Profiler = None, **shared):
+    """Create a publishing crew configured from the command line options"""
+    # Import here to avoid import errors during requirement check
+    from .crew import PublishingHouseCrew
+    
+    return PublishingHouseCrew(
+        writing_mode=args.writing_mode,
+        research_mode=args.research_mode,
+        final_control_mode=args.final_control,
+        max_workers=args.max_workers,
+        max_concurrent_llm_calls=args.max_llm_calls,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        context_budget_tokens=args.context_budget,
+        incremental_review_max_change=args.incremental_review_max_change,
+        patch_revisions=not args.full_rewrites,
+        research_passages=args.research_passages,
+        search_cache_ttl_hours=args.search_cache_ttl_hours,
+        profiler=profiler,
+        ollama_urls=args.ollama_urls,
+        review_cascade=args.review_cascade,
+        revision_policy=args.revision_policy,
+        book_state=not args.no_book_state,
+        **shared
+    )
+
+def create_book(inputs: dict, args, checkpoint: CheckpointStore) -> int:
+    """Run the publishing crew on the given inputs and save the resulting book"""
     print(f"📖 Topic: {inputs['topic']}")
     print(f"👥 Target audience: {inputs['target_audience']}")
     print(f"📏 Length: {inputs['book_length']}")
+    print(f"🔀 Research mode: {args.research_mode}")
+    print(f"🧵 Writing mode: {args.writing_mode}")
+    print(f"🔎 Final control: {args.final_control}")
+    print(f"💾 Progress checkpoint: {checkpoint.path}")
     print("-" * 50)
     
+    profiler = Profiler(enabled=args.profile)
+    output_path = book_path(inputs['topic'])
+    
     try:
-        # Import here to avoid import errors during requirement check
-        from .crew import PublishingHouseCrew
-        
         # Initialize and start the crew
         print("🔧 Initializing publishing crew...")
-        publishing_crew = PublishingHouseCrew()
+        publishing_crew = build_crew(args, profiler)
         
         # Execute the book creation process
         print("🎬 Starting book creation workflow...")
-        result = publishing_crew.run_complete_workflow(inputs=inputs)
-        
-        # Save the result
-        output_file = save_book(str(result), inputs['topic'])
+        output_file = publishing_crew.run_complete_workflow(inputs=inputs, checkpoint=checkpoint,
+                                                            output_path=output_path)
         
         # Final summary
         print("\n" + "=" * 50)
         print("✅ BOOK CREATION COMPLETED!")
         print("=" * 50)
         
-        if output_file:
-            print(f"💾 Book saved as: {output_file}")
-            print(f"📊 File size: {os.path.getsize(output_file) / 1024:.1f} KB")
+        print(f"💾 Book saved as: {output_file}")
+        print(f"📊 File size: {os.path.getsize(output_file) / 1024:.1f} KB")
         
         print(f"📖 Topic: {inputs['topic']}")
         print(f"👥 Target: {inputs['target_audience']}")
@@ -167,6 +317,9 @@ def main():
         print("- Verify SERPER_API_KEY environment variable")
         print("- Check config/agents.yaml and config/tasks.yaml files")
         print("- Review the full error trace above")
+        print(f"- Resume from the last completed step with: replay {checkpoint.path}")
+        if os.path.exists(output_path):
+            print(f"- The sections finished so far are in {output_path}")
         
         # Print full traceback in debug mode
         if os.getenv('DEBUG'):
@@ -175,10 +328,78 @@ def main():
             traceback.print_exc()
         
         return 1
+    
+    finally:
+        if profiler.enabled:
+            export_profile(profiler, Path(args.profile_dir) / checkpoint.path.stem)
+
+def export_profile(profiler: Profiler, base_path: Path) -> None:
+    """Write the recorded spans as JSON lines and as a Chrome trace"""
+    spans_file = profiler.export_jsonl(base_path.with_suffix('.spans.jsonl'))
+    trace_file = profiler.export_chrome_trace(base_path.with_suffix('.trace.json'))
+    print(f"⏱️ Profile saved: {spans_file} and {trace_file} (open in chrome://tracing or ui.perfetto.dev)")
 
 def run():
     """Entry point function for the CLI"""
     return main()
 
+def replay(argv=None):
+    """Resume an interrupted book from its checkpoint"""
+    args = parse_args(argv, replay=True)
+    
+    checkpoint = CheckpointStore(args.checkpoint) if args.checkpoint else CheckpointStore.latest(args.checkpoint_dir)
+    if checkpoint is None or not checkpoint.path.exists():
+        print(f"❌ No checkpoint found{f' at {args.checkpoint}' if args.checkpoint else f' in {args.checkpoint_dir}'}")
+        return 1
+    
+    inputs = checkpoint.load().get('inputs')
+    if not inputs:
+        print(f"❌ Checkpoint {checkpoint.path} does not record the book inputs")
+        return 1
+    
+    print("🏢 Publishing House MAS")
+    print("=" * 50)
+    print(f"♻️ Replaying book creation from {checkpoint.path}")
+    return create_book(inputs, args, checkpoint)
+
+def batch(argv=None):
+    """Write every book of a JSON lines or CSV job file without prompts"""
+    from .batch import run_batch
+    
+    args = parse_args(argv, batch=True)
+    
+    print("🏢 Publishing House MAS - Batch Mode")
+    print("=" * 50)
+    issues = check_requirements(args.ollama_urls)
+    for issue in issues:
+        print(f"  {issue}")
+    if any("❌" in issue for issue in issues):
+        print("\n❌ Critical issues found. Please fix them before continuing.")
+        return 1
+    
+    return run_batch(args)
+
+def serve(argv=None):
+    """Run the local HTTP job service"""
+    from .service import run_service
+    
+    args = parse_args(argv, serve=True)
+    
+    print("🏢 Publishing House MAS - Job Service")
+    print("=" * 50)
+    issues = check_requirements(args.ollama_urls)
+    for issue in issues:
+        print(f"  {issue}")
+    if any("❌" in issue for issue in issues):
+        print("\n❌ Critical issues found. Please fix them before continuing.")
+        return 1
+    
+    return run_service(args)
+
+def test(argv=None):
+    """Benchmark the workflow offline against a fake Ollama server"""
+    from .benchmark import main as run_benchmark
+    return run_benchmark(argv)
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
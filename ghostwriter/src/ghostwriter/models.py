@@ -0,0 +1,35 @@
+"""
+Settings of the agent LLMs: the defaults and the llm_settings of config/agents.yaml.
+
+Kept apart from the crew, so the requirement check and the service warm-up can read
+them without importing crewai.
+"""
+
+from pathlib import Path
+
+import yaml
+
+AGENTS_FILE = Path(__file__).parent / "config" / "agents.yaml"
+
+# Settings of every agent LLM; llm_settings in agents.yaml override them per agent.
+# num_ctx and keep_alive are pinned so Ollama neither reloads the model nor drops its prompt cache between calls.
+DEFAULT_LLM_SETTINGS = {
+    'model': "ollama/qwen3:14b",
+    'temperature': 0.4,
+    'seed': 42,
+    'num_ctx': 16384,
+    'keep_alive': "30m"
+}
+
+
+def load_agents_config(path: Path = AGENTS_FILE) -> dict:
+    """Read agents.yaml, or nothing if it is missing"""
+    if not Path(path).exists():
+        return {}
+    return yaml.safe_load(Path(path).read_text(encoding='utf-8')) or {}
+
+
+def agent_llm_settings(agents: dict, key: str = 'llm_settings') -> list:
+    """Complete LLM settings of every agent under `key`; every agent has llm_settings, if only the defaults"""
+    return [{**DEFAULT_LLM_SETTINGS, **(config.get(key) or {})}
+            for config in agents.values() if key == 'llm_settings' or config.get(key)]
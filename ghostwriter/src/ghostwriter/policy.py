@@ -0,0 +1,149 @@
+"""
+Revision policies: when to stop revising a chapter.
+
+After every review the policy sees the history of the chapter (decision, weighted issue
+score, reviewer and similarity to the previous draft for each cycle) and decides whether
+the chapter is final, and with which draft. Policies are picked by name and tuned per
+book length.
+"""
+
+from .drafts import diff_drafts
+from .schemas import ReviewVerdict
+
+ISSUE_WEIGHTS = {"HIGH": 3, "MEDIUM": 2, "LOW": 1}
+# Floor of the score of a verdict, for fallback verdicts that carry no structured issues
+DECISION_WEIGHTS = {"APPROVED": 0, "MINOR_REVISIONS": 1, "MAJOR_REVISIONS": 3, "REJECT": 5}
+
+
+class RevisionRound:
+    """What one review cycle of a chapter produced"""
+
+    def __init__(self, cycle: int, draft: str, verdict: ReviewVerdict, previous: "RevisionRound" = None) -> None:
+        self.cycle = cycle
+        self.draft = draft
+        self.decision = verdict.decision
+        self.source = verdict.source  # Linter and controller scores are not comparable
+        self.issue_score = max(
+            sum(ISSUE_WEIGHTS.get(issue.priority, 1) for issue in verdict.issues),
+            DECISION_WEIGHTS.get(verdict.decision, 1)
+        )
+        # Share of the draft left unchanged by the revision; None for the first draft
+        self.similarity = 1 - diff_drafts(previous.draft, draft)['changed_ratio'] if previous else None
+
+
+class PolicyDecision:
+    def __init__(self, accept: bool, reason: str, stalled: bool = False, best: RevisionRound = None) -> None:
+        self.accept = accept
+        self.reason = reason
+        self.stalled = stalled  # Accepted because revising stopped paying off, not because the draft is good
+        self.best = best  # Earlier round whose draft is accepted instead of the latest one, if any
+
+
+class RevisionPolicy:
+    """Decides after each review whether a chapter draft is final"""
+
+    name = "policy"
+
+    def __init__(self, max_cycles: int = 3, accept_minor_after: int = 2) -> None:
+        self.max_cycles = max_cycles
+        self.accept_minor_after = accept_minor_after
+
+    def decide(self, history: list) -> PolicyDecision:
+        latest = history[-1]
+        if latest.decision == "APPROVED":
+            return PolicyDecision(True, "approved")
+        if latest.decision == "MINOR_REVISIONS" and latest.cycle >= self.accept_minor_after:
+            return PolicyDecision(True, "only minor issues left")
+        if latest.cycle >= self.max_cycles:
+            return PolicyDecision(True, f"revision limit of {self.max_cycles} cycles reached")
+        return PolicyDecision(False, "revise")
+
+
+class FixedRevisionPolicy(RevisionPolicy):
+    """A fixed number of cycles; minor issues are accepted from the second cycle"""
+
+    name = "fixed"
+
+
+class ConvergenceRevisionPolicy(RevisionPolicy):
+    """Stops revising once drafts stop changing or the issue score stops going down.
+
+    A revision that leaves at least min_similarity of the draft unchanged without
+    lowering the issue score has stalled. So has a cycle that lowers the issue score by
+    less than min_improvement (as a share of the previous score) for `patience` cycles
+    in a row. Only scores from the same reviewer are compared, so a draft bounced by
+    the linter does not stall against a controller review. When a chapter is accepted
+    with issues left, the draft with the lowest score of that reviewer is kept, so a
+    revision that made the chapter worse is rolled back.
+    """
+
+    name = "convergence"
+
+    def __init__(self, max_cycles: int = 3, accept_minor_after: int = 2, min_similarity: float = 0.97,
+                 min_improvement: float = 0.25, patience: int = 1) -> None:
+        super().__init__(max_cycles, accept_minor_after)
+        self.min_similarity = min_similarity
+        self.min_improvement = min_improvement
+        self.patience = patience
+
+    def decide(self, history: list) -> PolicyDecision:
+        latest = history[-1]
+        decision = super().decide(history)
+        if decision.accept:
+            return self._keep_best(decision, history)
+        if len(history) < 2:
+            return decision
+
+        previous = history[-2]
+        if (previous.source == latest.source and latest.similarity >= self.min_similarity
+                and latest.issue_score >= previous.issue_score):
+            return self._keep_best(PolicyDecision(True, f"stalled: the revision kept {latest.similarity:.0%} of the "
+                                                        f"draft and the issue score stayed at {latest.issue_score}",
+                                                  stalled=True), history)
+
+        recent = [r for r in history if r.source == latest.source][-(self.patience + 1):]
+        if len(recent) == self.patience + 1 and all(
+            after.issue_score > before.issue_score * (1 - self.min_improvement)
+            for before, after in zip(recent, recent[1:])
+        ):
+            scores = ' → '.join(str(r.issue_score) for r in recent)
+            return self._keep_best(PolicyDecision(True, f"stalled: the issue score went {scores}", stalled=True),
+                                   history)
+
+        return decision
+
+    def _keep_best(self, decision: PolicyDecision, history: list) -> PolicyDecision:
+        """Point an acceptance with issues left at the best-scoring draft of the latest reviewer"""
+        latest = history[-1]
+        if latest.decision == "APPROVED":
+            return decision
+        best = min((r for r in history if r.source == latest.source), key=lambda r: (r.issue_score, -r.cycle))
+        if best is not latest and best.issue_score < latest.issue_score:
+            decision.best = best
+            decision.reason += f"; keeping the draft of cycle {best.cycle} (issue score {best.issue_score})"
+        return decision
+
+
+POLICIES = {policy.name: policy for policy in (FixedRevisionPolicy, ConvergenceRevisionPolicy)}
+
+# Settings of each policy per book length; long books have more chapters to spend cycles on
+POLICY_SETTINGS = {
+    'fixed': {
+        'short': {'max_cycles': 3},
+        'medium': {'max_cycles': 3},
+        'long': {'max_cycles': 3}
+    },
+    'convergence': {
+        'short': {'max_cycles': 4, 'min_similarity': 0.97, 'min_improvement': 0.2},
+        'medium': {'max_cycles': 3, 'min_similarity': 0.97, 'min_improvement': 0.25},
+        'long': {'max_cycles': 3, 'min_similarity': 0.95, 'min_improvement': 0.34}
+    }
+}
+
+
+def make_policy(name: str, book_length: str = 'medium') -> RevisionPolicy:
+    """Build the named revision policy with the settings for the book length"""
+    if name not in POLICIES:
+        raise ValueError(f"Unknown revision policy '{name}'. Choose one of: {', '.join(POLICIES)}")
+    settings = POLICY_SETTINGS[name]
+    return POLICIES[name](**settings.get(book_length, settings['medium']))
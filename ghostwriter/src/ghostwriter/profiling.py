@@ -0,0 +1,131 @@
+"""
+Lightweight span profiler for the book creation workflow.
+
+Phases, chapters, agent tasks and LLM calls are recorded as nested spans with their
+wall time and attributes (tokens, prefill time, queue wait, cache hits, revision
+cycles). Spans can be exported as JSON lines or in the Chrome trace-event format,
+which opens in chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Profiler:
+    """Collects spans from every thread of a run; a disabled profiler records nothing"""
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.spans = []
+        self.phase = None  # Phases run one after another, so the current one is global
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+
+    @contextmanager
+    def span(self, name: str, category: str, **attrs):
+        """Time the enclosed block; yields the attribute dict so the block can add to it"""
+        if not self.enabled:
+            yield attrs
+            return
+
+        with self._lock:
+            self._next_id += 1
+            span_id = self._next_id
+        stack = self._local.__dict__.setdefault('stack', [])
+        parent_id = stack[-1] if stack else None
+        if category == 'phase':
+            self.phase = name
+        phase = self.phase
+
+        stack.append(span_id)
+        started = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - started
+            stack.pop()
+            if attrs.get('completion_tokens') and not attrs.get('cache_hit') and duration > 0:
+                attrs['tokens_per_sec'] = round(attrs['completion_tokens'] / duration, 1)
+            thread = threading.current_thread()
+            record = {
+                'id': span_id,
+                'parent': parent_id,
+                'name': name,
+                'category': category,
+                'phase': phase,
+                'start': started - self._origin,
+                'duration': duration,
+                'thread': thread.name,
+                'tid': thread.ident,
+                'attrs': attrs
+            }
+            with self._lock:
+                self.spans.append(record)
+
+    def export_jsonl(self, path) -> Path:
+        """Write one JSON object per span, in start order"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in sorted(self.spans, key=lambda r: r['start']):
+                f.write(json.dumps(record, default=str) + '\n')
+        return path
+
+    def export_chrome_trace(self, path) -> Path:
+        """Write the spans as Chrome trace events (complete events, microsecond timestamps)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        events = [
+            {
+                'name': record['name'],
+                'cat': record['category'],
+                'ph': 'X',
+                'ts': round(record['start'] * 1e6),
+                'dur': round(record['duration'] * 1e6),
+                'pid': pid,
+                'tid': record['tid'],
+                'args': {'phase': record['phase'], **record['attrs']}
+            }
+            for record in self.spans
+        ]
+        threads = {record['tid']: record['thread'] for record in self.spans}
+        events += [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+        return path
+
+    def summary(self) -> dict:
+        """Per-phase totals of LLM calls, tokens, cache hits, prefill time and queue wait"""
+        phases = {}
+        for record in self.spans:
+            if record['category'] not in ('llm', 'task'):
+                continue
+            totals = phases.setdefault(record['phase'] or 'other', {
+                'llm_calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'llm_seconds': 0.0, 'prefill_seconds': 0.0, 'queue_wait': 0.0
+            })
+            attrs = record['attrs']
+            if record['category'] == 'task':
+                totals['queue_wait'] += attrs.get('queue_wait', 0.0)
+                continue
+            totals['llm_calls'] += 1
+            totals['cache_hits'] += 1 if attrs.get('cache_hit') else 0
+            totals['prompt_tokens'] += attrs.get('prompt_tokens', 0)
+            totals['completion_tokens'] += attrs.get('completion_tokens', 0)
+            totals['llm_seconds'] += record['duration']
+            totals['prefill_seconds'] += attrs.get('prefill_seconds', 0.0)
+        return phases
+
+
+# Shared by everything that is not given a profiler
+NULL_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,41 @@
+"""
+Prompt layout for reuse of the Ollama prompt cache.
+
+Ollama keeps the KV cache of the prompts it has processed and only prefills the
+tokens after the longest prefix a new prompt shares with a cached one. Task
+descriptions are therefore laid out as a shared prefix, the context blocks that many
+calls have in common with the most widely shared first, followed by the text of the
+call itself (chapter number, chapter content, revision notes). Context blocks are
+rendered the same way byte for byte on every call, and crewai puts the agent's system
+prompt and the task description at the start of the prompt, so calls of one agent on
+the same context share everything up to the call-specific text.
+"""
+
+import re
+
+# {name} in an embedded text would be taken for a crewai input placeholder
+PLACEHOLDER = re.compile(r'\{([A-Za-z_][A-Za-z0-9_\-]*)\}')
+
+
+def escape_placeholders(text: str, keep=()) -> str:
+    """Keep crewai from interpolating (and failing on) {name} patterns of an embedded text.
+
+    Names in keep (the workflow inputs) are left as placeholders.
+    """
+    return PLACEHOLDER.sub(lambda match: match.group(0) if match.group(1) in keep else f"{{ {match.group(1)} }}", text)
+
+
+def context_block(label: str, text: str) -> str:
+    """One block of shared context, rendered identically for every call"""
+    return f"=== {label.upper()} ===\n{escape_placeholders(text.strip())}\n=== END OF {label.upper()} ==="
+
+
+def layout_description(blocks: list, task_text: str) -> str:
+    """Task description with the shared context blocks first and the call-specific task text last.
+
+    blocks are (label, text) pairs, most widely shared first; empty blocks are left out.
+    """
+    prefix = '\n\n'.join(context_block(label, text) for label, text in blocks if text and text.strip())
+    if not prefix:
+        return task_text
+    return f"{prefix}\n\n=== YOUR TASK ===\n{task_text}"
@@ -0,0 +1,118 @@
+"""
+Local keyword retrieval over the research report.
+"""
+
+import math
+import re
+from collections import Counter
+
+from .drafts import split_paragraphs
+
+TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+HEADING = re.compile(r'^#{1,6}\s+(.*)$')
+STOPWORDS = frozenset("""
+    a about above after again against all also an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her here
+    hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or other
+    our ours out over own same she should so some such than that the their theirs them then there these they this
+    those through to too under until up very was we were what when where which while who whom why will with would
+    you your yours chapter chapters
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """Lowercase content words of a text"""
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def split_passages(text: str, max_words: int = 150) -> list:
+    """Cut a report into passages of at most about max_words words.
+
+    Short paragraphs are merged with the next ones, long paragraphs are split at sentence
+    boundaries, and every passage is prefixed with the heading of the section it comes from.
+    """
+    passages = []
+    heading = ''
+    current = []
+    current_words = 0
+
+    def flush():
+        nonlocal current, current_words
+        if current:
+            body = ' '.join(current)
+            passages.append(f"[{heading}] {body}" if heading else body)
+        current, current_words = [], 0
+
+    for paragraph in split_paragraphs(text):
+        match = HEADING.match(paragraph)
+        if match and '\n' not in paragraph:
+            flush()
+            heading = match.group(1).strip()
+            continue
+
+        for sentence in re.split(r'(?<=[.!?])\s+', ' '.join(paragraph.split())):
+            words = len(sentence.split())
+            if current and current_words + words > max_words:
+                flush()
+            current.append(sentence)
+            current_words += words
+        if current_words >= max_words / 2:
+            flush()
+    flush()
+
+    return passages
+
+
+class ResearchIndex:
+    """BM25 index over the passages of a research report"""
+
+    def __init__(self, text: str, max_words: int = 150, k1: float = 1.5, b: float = 0.75) -> None:
+        self.passages = split_passages(text, max_words)
+        self.k1 = k1
+        self.b = b
+        self._term_counts = [Counter(tokenize(passage)) for passage in self.passages]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+        document_frequency = Counter(term for counts in self._term_counts for term in counts)
+        total = len(self.passages)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def score(self, query_terms: list, index: int) -> float:
+        counts = self._term_counts[index]
+        norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / (self._average_length or 1))
+        return sum(
+            self._idf[term] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+            for term in query_terms if term in counts
+        )
+
+    def search(self, query: str, k: int = 6) -> list:
+        """Return the k passages most relevant to the query, in report order"""
+        query_terms = set(tokenize(query))
+        scores = [(self.score(query_terms, i), i) for i in range(len(self.passages))]
+        best = sorted(i for score, i in sorted(scores, reverse=True)[:k] if score > 0)
+        # Nothing matches: the opening of the report (usually its summary) is the best guess
+        return [self.passages[i] for i in best] if best else self.passages[:k]
+
+
+URL = re.compile(r'https?://[^\s<>()\[\]"\'`]+')
+
+
+def extract_sources(*texts: str) -> list:
+    """Unique URLs cited in the texts, in order of first appearance.
+
+    URLs that differ only in letter case of the host, a trailing slash or a #fragment
+    count as the same source.
+    """
+    sources = {}
+    for text in texts:
+        for url in URL.findall(text):
+            url = url.rstrip('.,;:!?*_')
+            scheme, _, rest = url.partition('://')
+            host, _, path = rest.partition('/')
+            key = f"{host.lower()}/{path.split('#')[0].rstrip('/')}"
+            sources.setdefault(key, url)
+    return list(sources.values())
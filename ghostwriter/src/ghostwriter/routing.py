@@ -0,0 +1,119 @@
+"""
+Pool of Ollama endpoints with health checks and least-loaded routing.
+
+Every LLM call is sent to the healthy endpoint with the fewest requests in flight.
+An endpoint that fails a call or a health check is ejected for a while. Once its
+ejection has expired, or a health check succeeds again, it takes calls again.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+
+def ollama_urls_from_env() -> list:
+    """Endpoints listed in OLLAMA_URLS (comma-separated), or the local default"""
+    urls = [url.strip() for url in os.getenv('OLLAMA_URLS', '').split(',') if url.strip()]
+    return urls or [DEFAULT_OLLAMA_URL]
+
+
+class Endpoint:
+    """One Ollama server and its routing counters"""
+
+    def __init__(self, url: str) -> None:
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class EndpointPool:
+    """Routes calls to the least loaded healthy endpoint; thread-safe"""
+
+    def __init__(self, urls: list = None, eject_seconds: float = 30.0, health_interval: float = 15.0,
+                 timeout: float = 5.0) -> None:
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls or [DEFAULT_OLLAMA_URL])]
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._checker = None
+
+    @property
+    def urls(self) -> list:
+        return [endpoint.url for endpoint in self.endpoints]
+
+    def start_health_checks(self) -> None:
+        """Probe every endpoint periodically in a background thread; only useful with several endpoints"""
+        if self._checker is None and len(self.endpoints) > 1 and self.health_interval > 0:
+            self._checker = threading.Thread(target=self._check_forever, name="endpoint-health", daemon=True)
+            self._checker.start()
+
+    def _check_forever(self) -> None:
+        healthy = dict.fromkeys(self.urls, True)
+        while True:
+            time.sleep(self.health_interval)
+            for url, ok in self.check().items():
+                if ok != healthy[url]:
+                    print(f"✅ Ollama endpoint {url} is back" if ok else
+                          f"⚠️ Ollama endpoint {url} failed its health check; ejected until it answers again")
+                healthy[url] = ok
+
+    def check(self) -> dict:
+        """Probe every endpoint now; returns whether each one answered"""
+        results = {}
+        for endpoint in self.endpoints:
+            try:
+                healthy = requests.get(f"{endpoint.url}/api/tags", timeout=self.timeout).status_code == 200
+            except requests.RequestException:
+                healthy = False
+            with self._lock:
+                if healthy:
+                    endpoint.ejected_until = 0.0
+                else:
+                    endpoint.ejected_until = max(endpoint.ejected_until, time.monotonic() + self.eject_seconds)
+            results[endpoint.url] = healthy
+        return results
+
+    @contextmanager
+    def acquire(self, exclude: tuple = ()):
+        """Reserve the endpoint for one call: the available one with the fewest calls in flight.
+
+        If every endpoint is ejected, the one whose ejection ends first is tried anyway.
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            available = [e for e in candidates if e.available(now)]
+            if available:
+                endpoint = min(available, key=lambda e: (e.outstanding, e.requests))
+            else:
+                endpoint = min(candidates, key=lambda e: e.ejected_until)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def eject(self, endpoint: Endpoint, error: Exception) -> None:
+        """Take a failing endpoint out of rotation for eject_seconds"""
+        with self._lock:
+            endpoint.failures += 1
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+        print(f"⚠️ Ollama endpoint {endpoint.url} failed ({type(error).__name__}); ejected for {self.eject_seconds:.0f}s")
+
+    def stats(self) -> dict:
+        """Calls and failures per endpoint"""
+        with self._lock:
+            return {e.url: {'requests': e.requests, 'failures': e.failures} for e in self.endpoints}
@@ -0,0 +1,205 @@
+"""
+Structured outputs exchanged between the agents of the publishing house.
+"""
+
+import json
+import re
+from typing import Literal
+
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+THINK_BLOCK = re.compile(r'<think>.*?</think>', re.DOTALL | re.IGNORECASE)
+CODE_FENCE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL | re.IGNORECASE)
+
+
+def extract_json(text: str):
+    """Parse the JSON object in a model response, ignoring reasoning blocks, code fences and chatter.
+
+    Raises ValueError if the response holds no parsable JSON object.
+    """
+    text = THINK_BLOCK.sub('', text)
+    fenced = CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        raise ValueError("no JSON object found in the response")
+    try:
+        return json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON: {e}") from e
+
+
+class ChapterSpec(BaseModel):
+    """What the designer planned for one chapter"""
+
+    number: int = Field(ge=1)
+    title: str = Field(min_length=1)
+    description: str = Field(min_length=1)
+    target_words: int = Field(default=2000, ge=300, le=10000)
+
+    def render(self) -> str:
+        """Format the spec as a prompt section"""
+        return (f"Chapter {self.number}: {self.title}\n"
+                f"Target length: about {self.target_words} words\n\n"
+                f"{self.description}")
+
+
+class BookOutline(BaseModel):
+    """Machine-readable book design: chapter specs plus the rules shared by every chapter"""
+
+    title: str = Field(min_length=1)
+    subtitle: str = ""
+    chapters: list[ChapterSpec] = Field(min_length=1, max_length=30)
+    style_rules: list[str] = Field(default_factory=list)
+
+    @field_validator('style_rules', mode='before')
+    @classmethod
+    def _split_style_rules(cls, value):
+        # Models sometimes return the rules as a single paragraph
+        if isinstance(value, str):
+            return [line.strip(' -*\t') for line in value.splitlines() if line.strip(' -*\t')]
+        return value
+
+    @model_validator(mode='after')
+    def _check_numbering(self):
+        numbers = [chapter.number for chapter in self.chapters]
+        if numbers != list(range(1, len(numbers) + 1)):
+            raise ValueError(f"chapters must be numbered 1..{len(numbers)} in order, got {numbers}")
+        return self
+
+    def chapter(self, chapter_num: int) -> ChapterSpec:
+        return self.chapters[chapter_num - 1]
+
+    def chapter_brief(self, chapter_num: int) -> str:
+        """Everything a writer needs for one chapter: its own spec, its neighbours' titles and the style rules"""
+        parts = [f"BOOK: {self.title}" + (f" - {self.subtitle}" if self.subtitle else "")]
+        if chapter_num > 1:
+            parts.append(f"PREVIOUS CHAPTER: {self.chapter(chapter_num - 1).title}")
+        parts.append(f"THIS CHAPTER:\n{self.chapter(chapter_num).render()}")
+        if chapter_num < len(self.chapters):
+            parts.append(f"NEXT CHAPTER: {self.chapter(chapter_num + 1).title}")
+        if self.style_rules:
+            parts.append("STYLE RULES:\n" + '\n'.join(f"- {rule}" for rule in self.style_rules))
+        return '\n\n'.join(parts)
+
+
+PRIORITY_ORDER = {'HIGH': 0, 'MEDIUM': 1, 'LOW': 2}
+
+
+class ReviewIssue(BaseModel):
+    """One problem found by the controller"""
+
+    problem: str = Field(min_length=1)
+    location: str = ""
+    suggestion: str = ""
+    category: str = ""
+    priority: Literal['HIGH', 'MEDIUM', 'LOW'] = 'MEDIUM'
+
+    @field_validator('priority', mode='before')
+    @classmethod
+    def _normalize_priority(cls, value):
+        return value.strip().upper() if isinstance(value, str) else value
+
+    def render(self) -> str:
+        """Format the issue as one revision note"""
+        note = f"- [{self.priority}]"
+        if self.location:
+            note += f" ({self.location})"
+        note += f" {self.problem}"
+        if self.suggestion:
+            note += f" -> {self.suggestion}"
+        return note
+
+
+class ReviewVerdict(BaseModel):
+    """Decision of a chapter review with the issues the writer has to address"""
+
+    decision: Literal['APPROVED', 'MINOR_REVISIONS', 'MAJOR_REVISIONS', 'REJECT']
+    summary: str = ""
+    issues: list[ReviewIssue] = Field(default_factory=list)
+    resolved_issues: list[str] = Field(default_factory=list)
+    source: Literal['controller', 'linter'] = 'controller'
+
+    @field_validator('decision', mode='before')
+    @classmethod
+    def _normalize_decision(cls, value):
+        return '_'.join(value.strip().upper().split()) if isinstance(value, str) else value
+
+    @model_validator(mode='after')
+    def _check_issues(self):
+        if self.decision != 'APPROVED' and not self.issues:
+            raise ValueError(f"decision {self.decision} must list the issues the writer has to fix")
+        return self
+
+    def revision_notes(self) -> str:
+        """Issues ordered by priority, formatted for the writer"""
+        issues = sorted(self.issues, key=lambda issue: PRIORITY_ORDER[issue.priority])
+        notes = '\n'.join(issue.render() for issue in issues)
+        return f"{self.summary}\n\n{notes}".strip() if self.summary else notes
+
+
+# The check sheets of every chapter go into one prompt, so each list of a sheet is capped
+SHEET_MAX_ENTRIES = 20
+
+
+def _as_mapping(value):
+    """Read a {name: description} mapping that a model returned as a list of objects or names"""
+    # Models sometimes return [{"term": ..., "definition": ...}] instead of a mapping
+    if not isinstance(value, list):
+        return value
+    mapping = {}
+    for item in value:
+        if isinstance(item, str) and item.strip():
+            mapping[item.strip()] = ''
+        elif isinstance(item, dict):
+            name = item.get('term') or item.get('name') or item.get('entity')
+            if name:
+                mapping[str(name)] = str(item.get('definition') or item.get('usage') or item.get('description') or '')
+    return mapping
+
+
+class ChapterCheck(BaseModel):
+    """Final check of one chapter: its remaining problems and a sheet of the terms, names and facts it uses"""
+
+    chapter: int = Field(ge=1)
+    findings: list[ReviewIssue] = Field(default_factory=list)
+    terms: dict[str, str] = Field(default_factory=dict)
+    names: list[str] = Field(default_factory=list)
+    facts: list[str] = Field(default_factory=list)
+
+    @field_validator('terms', mode='before')
+    @classmethod
+    def _terms_as_dict(cls, value):
+        return _as_mapping(value)
+
+    def render(self, limit: int = SHEET_MAX_ENTRIES, priorities: tuple = ('HIGH', 'MEDIUM', 'LOW')) -> str:
+        """Format the check as a compact sheet for the cross-chapter review, with at most limit entries per list"""
+        parts = [f"CHAPTER {self.chapter}"]
+        findings = [issue for issue in self.findings if issue.priority in priorities]
+        if findings:
+            parts.append("Findings:\n" + '\n'.join(issue.render() for issue in findings[:limit]))
+        if self.terms:
+            parts.append("Terms:\n" + '\n'.join(f"- {term}: {usage}" for term, usage in list(self.terms.items())[:limit]))
+        if self.names:
+            parts.append("Names: " + ', '.join(self.names[:limit]))
+        if self.facts:
+            parts.append("Facts and figures:\n" + '\n'.join(f"- {fact}" for fact in self.facts[:limit]))
+        return '\n'.join(parts)
+
+
+class ChapterState(BaseModel):
+    """What an approved chapter adds to the book state: who and what it introduces, what it claims and leaves open"""
+
+    chapter: int = Field(ge=1)
+    entities: dict[str, str] = Field(default_factory=dict)
+    terms: dict[str, str] = Field(default_factory=dict)
+    claims: list[str] = Field(default_factory=list)
+    threads_opened: list[str] = Field(default_factory=list)
+    threads_closed: list[str] = Field(default_factory=list)
+
+    @field_validator('entities', 'terms', mode='before')
+    @classmethod
+    def _entries_as_dict(cls, value):
+        return _as_mapping(value)
@@ -0,0 +1,295 @@
+"""
+Local HTTP job service: submit books, poll their status and stream their progress.
+
+Worker threads each keep one warmed PublishingHouseCrew (agents, LLM clients, caches)
+and reset it between books, and every model of the agents is loaded into every Ollama
+endpoint once at startup, with the context size the agents call it with. All crews share one LLM semaphore, one endpoint pool and one web search tool.
+Progress events of a job are streamed as server-sent events while it runs.
+
+    POST /jobs                 {"topic": ..., "target_audience": ..., "book_length": ...}
+    GET  /jobs                 all jobs
+    GET  /jobs/<id>            status of one job
+    GET  /jobs/<id>/events     progress as server-sent events, until the job ends
+    GET  /jobs/<id>/book       the finished book as Markdown
+    GET  /health               workers, queue length and calls per endpoint
+"""
+
+import json
+import queue
+import threading
+import time
+import traceback
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+from .batch import parse_job
+from .checkpoint import CheckpointStore
+from .models import agent_llm_settings, load_agents_config
+from .routing import EndpointPool
+from .tools import CachedSearchTool
+
+
+class BookJob:
+    """One book request with its status and the progress events it has produced"""
+
+    FINISHED = ('done', 'failed')
+
+    def __init__(self, inputs: dict) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.inputs = inputs
+        self.status = 'queued'
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.output = None
+        self.error = None
+        self.events = []
+        self._changed = threading.Condition()
+
+    def add_event(self, event: dict) -> None:
+        """Record a progress event and wake up the streams following this job"""
+        with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    def set_status(self, status: str, **fields) -> None:
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.status = status
+        self.add_event({'event': 'status', 'time': time.time(), 'status': status, **fields})
+
+    def wait_for_events(self, seen: int, timeout: float) -> list:
+        """Return the events after the first `seen` ones, waiting up to timeout for new ones"""
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > seen or self.status in self.FINISHED, timeout)
+            return self.events[seen:]
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            **self.inputs,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'seconds': round((self.finished or time.time()) - self.started, 1) if self.started else None,
+            'output': self.output,
+            'error': self.error,
+            'events': len(self.events)
+        }
+
+
+class JobService:
+    """Queue of book jobs processed by worker threads that each reuse one crew"""
+
+    def __init__(self, args, workers: int = 2) -> None:
+        self.args = args
+        self.workers = workers
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        # One LLM limit, one endpoint pool and one search rate limit for every crew of the service
+        self.endpoint_pool = EndpointPool(args.ollama_urls)
+        self._shared = {
+            'llm_slots': threading.BoundedSemaphore(args.max_llm_calls),
+            'endpoint_pool': self.endpoint_pool,
+            'search_tool': CachedSearchTool(cache_dir=args.cache_dir, ttl_hours=args.search_cache_ttl_hours)
+        }
+
+    def start(self) -> None:
+        for number in range(1, self.workers + 1):
+            threading.Thread(target=self._work, name=f"book-worker-{number}", daemon=True).start()
+
+    def submit(self, inputs: dict) -> BookJob:
+        job = BookJob(inputs)
+        with self._lock:
+            self.jobs[job.id] = job
+        job.set_status('queued')
+        self._queue.put(job)
+        return job
+
+    def queued(self) -> int:
+        return self._queue.qsize()
+
+    def _work(self) -> None:
+        from .main import book_basename, build_crew
+
+        crew = None
+        while True:
+            job = self._queue.get()
+            if crew is None:
+                try:
+                    crew = build_crew(self.args, **self._shared)
+                except Exception as e:
+                    # The next job tries again; the worker stays up
+                    traceback.print_exc()
+                    job.set_status('failed', finished=time.time(), error=f"{type(e).__name__}: {e}")
+                    print(f"❌ Job {job.id}: could not set up a crew: {job.error}")
+                    continue
+            crew.reset()
+            crew.progress = job.add_event
+            basename = f"{book_basename(job.inputs['topic'])}_{job.id}"
+            self._run(crew, job, basename)
+
+    def _run(self, crew, job: BookJob, basename: str) -> None:
+        """Write the book of one job; a failure only fails this job"""
+        from .main import book_path
+
+        checkpoint = CheckpointStore(Path(self.args.checkpoint_dir) / f"{basename}.jsonl")
+        print(f"🚀 Job {job.id}: starting '{job.inputs['topic']}' ({job.inputs['book_length']})")
+        job.set_status('running', started=time.time())
+        try:
+            output = crew.run_complete_workflow(
+                inputs=job.inputs, checkpoint=checkpoint,
+                output_path=book_path(job.inputs['topic'], output_dir=self.args.output_dir, basename=basename)
+            )
+            job.set_status('done', finished=time.time(), output=output)
+            print(f"✅ Job {job.id}: saved as {output}")
+        except Exception as e:
+            traceback.print_exc()
+            job.set_status('failed', finished=time.time(), error=f"{type(e).__name__}: {e}")
+            print(f"❌ Job {job.id}: failed: {job.error} (resume with: replay {checkpoint.path})")
+        finally:
+            crew.progress = None
+
+
+def configured_models(review_cascade: bool = False) -> list:
+    """Distinct (model, num_ctx, keep_alive) of the agent LLMs in agents.yaml, with the Ollama model names"""
+    agents = load_agents_config()
+    settings = agent_llm_settings(agents)
+    if review_cascade:
+        settings += agent_llm_settings(agents, 'first_pass_llm_settings')
+    return sorted({(entry['model'].split('/', 1)[-1], entry['num_ctx'], entry['keep_alive']) for entry in settings})
+
+
+def warm_up_model(base_url: str, model: str, num_ctx: int, keep_alive: str = "30m") -> bool:
+    """Load a model into Ollama before the first job, and keep it loaded between jobs.
+
+    Ollama reloads a model called with another context size, so it is loaded with the
+    num_ctx the agents use.
+    """
+    try:
+        response = requests.post(f"{base_url}/api/generate", timeout=300, json={
+            'model': model, 'keep_alive': keep_alive, 'options': {'num_ctx': num_ctx}
+        })
+        return response.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def make_handler(service: JobService):
+    """Build the request handler class of the HTTP API"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status: int = 200) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job(self, job_id: str):
+            job = service.jobs.get(job_id)
+            if job is None:
+                self._send_json({'error': f"no job {job_id}"}, 404)
+            return job
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/jobs':
+                return self._send_json({'error': 'not found'}, 404)
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(payload, dict):
+                    raise ValueError("expected a JSON object")
+                job = service.submit(parse_job(payload))
+            except ValueError as e:
+                return self._send_json({'error': str(e)}, 400)
+            self._send_json(job.to_dict(), 202)
+
+        def do_GET(self):
+            parts = [part for part in self.path.split('?')[0].split('/') if part]
+            if parts == ['health']:
+                return self._send_json({'status': 'ok', 'workers': service.workers, 'queued': service.queued(),
+                                        'endpoints': service.endpoint_pool.stats()})
+            if parts == ['jobs']:
+                return self._send_json([job.to_dict() for job in list(service.jobs.values())])
+            if len(parts) < 2 or parts[0] != 'jobs':
+                return self._send_json({'error': 'not found'}, 404)
+
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if len(parts) == 2:
+                return self._send_json(job.to_dict())
+            if parts[2:] == ['events']:
+                return self._stream_events(job)
+            if parts[2:] == ['book']:
+                if job.status != 'done':
+                    return self._send_json({'error': f"job {job.id} is {job.status}"}, 409)
+                body = Path(job.output).read_bytes()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/markdown; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            self._send_json({'error': 'not found'}, 404)
+
+        def _stream_events(self, job: BookJob) -> None:
+            """Send every event of the job so far, then new ones as they happen, until it ends"""
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+
+            seen = 0
+            try:
+                while True:
+                    events = job.wait_for_events(seen, timeout=15)
+                    for event in events:
+                        self.wfile.write(f"event: {event['event']}\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+                    if not events:
+                        self.wfile.write(b": keep-alive\n\n")  # Stops proxies from closing an idle stream
+                    self.wfile.flush()
+                    seen += len(events)
+                    if job.status in BookJob.FINISHED and seen == len(job.events):
+                        return
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The client went away; the job carries on
+
+    return Handler
+
+
+def run_service(args) -> int:
+    """Serve the job API until interrupted"""
+    service = JobService(args, workers=args.workers)
+    for url in service.endpoint_pool.urls:
+        for model, num_ctx, keep_alive in configured_models(args.review_cascade):
+            print(f"🔥 Loading {model} (num_ctx {num_ctx}) on {url}...")
+            if warm_up_model(url, model, num_ctx, keep_alive):
+                print("✅ Model loaded")
+            else:
+                print("⚠️ Could not preload the model; the first call will load it")
+
+    service.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    server.daemon_threads = True
+    print(f"🌐 Serving on http://{args.host}:{args.port} with {args.workers} workers "
+          f"and at most {args.max_llm_calls} LLM calls in flight")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped")
+    finally:
+        server.server_close()
+    return 0
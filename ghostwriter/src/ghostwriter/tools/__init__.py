@@ -0,0 +1,3 @@
+from .search_tool import CachedSearchTool, RateLimiter, SearchBackend, SerperBackend
+
+__all__ = ["CachedSearchTool", "RateLimiter", "SearchBackend", "SerperBackend"]
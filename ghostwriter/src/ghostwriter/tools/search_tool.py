@@ -0,0 +1,194 @@
+"""
+Web search tool for the researcher with a persistent result cache.
+
+Searches go through a pluggable backend (Serper by default) over one pooled HTTP
+session. Results are cached on disk with a time to live, identical queries in flight
+at the same time are sent only once, and requests are capped both in concurrency
+and in rate so parallel books do not trip the provider's limits.
+"""
+
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Type
+
+import requests
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field, PrivateAttr
+from requests.adapters import HTTPAdapter
+
+from ..cache import ResponseCache
+
+
+class SearchBackend(ABC):
+    """A search provider; subclasses turn a query into a formatted result text"""
+
+    name = "backend"
+
+    @abstractmethod
+    def search(self, session: requests.Session, query: str, num_results: int) -> str:
+        """Run a query and return its results as text for the agent"""
+
+
+class SerperBackend(SearchBackend):
+    """Google results through the Serper API (or any server speaking its protocol)"""
+
+    name = "serper"
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 15.0) -> None:
+        self.api_key = api_key or os.getenv('SERPER_API_KEY', '')
+        # Point SERPER_BASE_URL at a local fixture server to test without the real API
+        self.base_url = (base_url or os.getenv('SERPER_BASE_URL', 'https://google.serper.dev')).rstrip('/')
+        self.timeout = timeout
+
+    def search(self, session: requests.Session, query: str, num_results: int) -> str:
+        response = session.post(
+            f"{self.base_url}/search",
+            json={'q': query, 'num': num_results},
+            headers={'X-API-KEY': self.api_key, 'Content-Type': 'application/json'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return self.format_results(response.json(), num_results)
+
+    @staticmethod
+    def format_results(data: dict, num_results: int) -> str:
+        """Render a Serper response as the text given to the agent"""
+        parts = []
+        answer = data.get('answerBox') or {}
+        if answer.get('answer') or answer.get('snippet'):
+            parts.append(f"Answer: {answer.get('answer') or answer.get('snippet')}")
+
+        for result in data.get('organic', [])[:num_results]:
+            parts.append(
+                f"Title: {result.get('title', '')}\n"
+                f"Link: {result.get('link', '')}\n"
+                f"Snippet: {result.get('snippet', '')}"
+            )
+        return '\n---\n'.join(parts) or "No results found."
+
+
+class RateLimiter:
+    """Spaces calls out to at most rate_per_second, shared by all threads"""
+
+    def __init__(self, rate_per_second: float) -> None:
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SearchToolInput(BaseModel):
+    """Input schema for CachedSearchTool."""
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+class CachedSearchTool(BaseTool):
+    name: str = "Search the internet"
+    description: str = (
+        "A tool that can be used to search the internet with a search_query. "
+        "Returns titles, links and snippets of the top results."
+    )
+    args_schema: Type[BaseModel] = SearchToolInput
+
+    num_results: int = 10
+
+    _backend: SearchBackend = PrivateAttr()
+    _cache: ResponseCache = PrivateAttr(default=None)
+    _session: requests.Session = PrivateAttr()
+    _slots: threading.BoundedSemaphore = PrivateAttr()
+    _rate_limiter: RateLimiter = PrivateAttr()
+    _in_flight: dict = PrivateAttr(default_factory=dict)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, backend: SearchBackend = None, cache_dir: str = ".ghostwriter_cache", ttl_hours: float = 168,
+                 max_concurrent: int = 4, rate_per_second: float = 5.0, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._backend = backend or SerperBackend()
+        self._cache = ResponseCache(
+            Path(cache_dir) / "search_results.sqlite3",
+            max_bytes=64 * 1024 * 1024,
+            ttl_seconds=ttl_hours * 3600
+        ) if cache_dir and ttl_hours > 0 else None
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrent, pool_maxsize=max_concurrent)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._rate_limiter = RateLimiter(rate_per_second)
+        self._stats = {'requests': 0, 'cache_hits': 0, 'deduplicated': 0, 'errors': 0}
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Cache key form of a query: case, spacing and surrounding quotes do not change a search"""
+        return re.sub(r'\s+', ' ', query).strip().strip('"\'').strip().lower()
+
+    def _run(self, search_query: str) -> str:
+        # Only the cache key is normalized; the backend gets the query as written, quoted phrases included
+        query = search_query.strip()
+        key = ResponseCache.make_key(backend=self._backend.name, query=self.normalize_query(query),
+                                     num_results=self.num_results)
+
+        if self._cache:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._bump('cache_hits')
+                return cached
+
+        # The first caller of a query runs it; concurrent callers wait for its result
+        with self._lock:
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._in_flight[key] = Future()
+        if not owner:
+            self._bump('deduplicated')
+            return pending.result()
+
+        try:
+            result = self._search(query, key)
+            pending.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            if not pending.done():
+                pending.set_result(f"Search failed for '{search_query}'")
+
+    def _search(self, query: str, key: str) -> str:
+        """Send a query to the backend within the concurrency and rate limits"""
+        with self._slots:
+            self._rate_limiter.wait()
+            self._bump('requests')
+            try:
+                result = self._backend.search(self._session, query, self.num_results)
+            except (requests.RequestException, ValueError) as e:
+                # Failures are reported to the agent but never cached
+                self._bump('errors')
+                return f"Search failed for '{query}': {e}"
+
+        if self._cache:
+            self._cache.put(key, result)
+        return result
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        """Return request, cache hit, deduplication and error counters"""
+        with self._lock:
+            return dict(self._stats)